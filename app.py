@@ -5,11 +5,15 @@ Funkciók: tisztítás, RAM/CPU monitor, duplikált fájlok, registry,
 """
 
 from flask import Flask, render_template, jsonify, request, send_from_directory, Response
-import os, shutil, platform, subprocess, stat, time, json, hashlib, zipfile
-import threading, re, tempfile, sys
+import os, shutil, platform, subprocess, stat, time, json, hashlib, zipfile, zlib
+import threading, re, tempfile, sys, random, uuid, mmap, sqlite3, heapq, errno, copy
+import contextlib, fnmatch, math
 from pathlib import Path
 from datetime import datetime, timedelta
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, namedtuple, deque
 
 # psutil opcionális (RAM/CPU monitorhoz)
 try:
@@ -30,12 +34,66 @@ os.makedirs(os.path.join(BASE_DIR, "backups"), exist_ok=True)
 # ── Config & Profiles ──────────────────────────────────────────────────────────
 
 CONFIG_FILE  = os.path.join(DATA_DIR, "config.json")
-HISTORY_FILE = os.path.join(DATA_DIR, "history.json")
+HISTORY_FILE = os.path.join(DATA_DIR, "history.json")      # legacy, migrated into HISTORY_DB
+HISTORY_DB   = os.path.join(DATA_DIR, "history.db")
 SCHED_FILE   = os.path.join(DATA_DIR, "schedule.json")
+INDEX_FILE   = os.path.join(DATA_DIR, "scan_index.json")
+
+def write_json_atomic(path, obj, **kw):
+    """Write JSON to a temp file next to path, then rename over it."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, ensure_ascii=False, **kw)
+        os.replace(tmp, path)
+    except:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+class JsonFile:
+    """A JSON document cached in memory. load() re-parses only when the
+    file's (mtime, size, inode) stamp changed and hands out a deep copy
+    (or, with shared=True, the cached object itself, which must not be
+    modified); a file that fails to parse keeps the last good copy. save() writes
+    atomically. Hold `lock` around load + save for read-modify-write."""
+
+    def __init__(self, path, default):
+        self.path = path
+        self.default = default
+        self.lock = threading.RLock()
+        self.stamp = None
+        self.data = None
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size, st.st_ino
+        except OSError: return None
+
+    def load(self, shared=False):
+        with self.lock:
+            stamp = self._stamp()
+            if stamp is None:
+                self.stamp, self.data = None, None
+            elif stamp != self.stamp:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f: self.data = json.load(f)
+                    self.stamp = stamp
+                except (OSError, ValueError): pass
+            data = self.data if self.data is not None else self.default
+            return data if shared else copy.deepcopy(data)
+
+    def save(self, obj):
+        with self.lock:
+            write_json_atomic(self.path, obj, indent=2)
+            self.data, self.stamp = copy.deepcopy(obj), self._stamp()
 
 DEFAULT_CONFIG = {
     "theme": "dark",
     "active_profile": "default",
+    "history_max": 5000,    # entries kept (0 = unlimited)
+    "history_days": 0,      # drop entries older than this (0 = never)
     "profiles": {
         "default": {
             "name": "Alapértelmezett",
@@ -46,101 +104,568 @@ DEFAULT_CONFIG = {
             "custom_dirs": [],
             "auto_backup": True,
             "backup_max_mb": 200,
+            "backup_format": "store",   # "store" (deduplicated) or "zip"
+            "throttle": "off",          # "off", "scheduled" (auto cleans) or "always"
+            "throttle_mb_per_sec": 20,  # read budget for backup and hashing (0 = unlimited)
+            "throttle_ops_per_sec": 500,  # file deletions per second (0 = unlimited)
+            "throttle_low_priority": True,  # nice 19 + idle I/O class (Linux)
+            "throttle_max_load": 0,     # pause while 1-min load per CPU exceeds this (0 = off)
+            "throttle_max_disk_busy": 0,  # pause while a disk is busier than this % (0 = off)
+            "rules": [],                # include/exclude rules added to DEFAULT_RULES
         }
     }
 }
 
+CONFIG = JsonFile(CONFIG_FILE, DEFAULT_CONFIG)
+
 def load_config():
-    try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                cfg = json.load(f)
-                # merge missing keys
-                for k, v in DEFAULT_CONFIG.items():
-                    if k not in cfg:
-                        cfg[k] = v
-                return cfg
-    except: pass
-    return DEFAULT_CONFIG.copy()
+    cfg = CONFIG.load()
+    # merge missing keys
+    for k, v in DEFAULT_CONFIG.items():
+        if k not in cfg:
+            cfg[k] = copy.deepcopy(v)
+    return cfg
 
 def save_config(cfg):
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cfg, f, ensure_ascii=False, indent=2)
+    try: CONFIG.save(cfg)
     except: pass
 
 def get_profile():
-    cfg = load_config()
+    cfg = CONFIG.load(shared=True)
     pid = cfg.get("active_profile", "default")
-    return cfg.get("profiles", {}).get(pid, DEFAULT_CONFIG["profiles"]["default"])
+    return copy.deepcopy(cfg.get("profiles", {}).get(pid, DEFAULT_CONFIG["profiles"]["default"]))
 
-# ── History ────────────────────────────────────────────────────────────────────
+def config_stamp():
+    """Changes whenever the config file does; part of cached result keys."""
+    with CONFIG.lock:
+        CONFIG.load(shared=True)
+        return CONFIG.stamp
 
-def load_history():
-    try:
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except: pass
-    return []
+# ── History ────────────────────────────────────────────────────────────────────
 
-def save_history(entry):
-    h = load_history(); h.insert(0, entry)
-    try:
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(h[:100], f, ensure_ascii=False, indent=2)
-    except: pass
+class HistoryStore:
+    """Clean history in SQLite (DATA_DIR/history.db). Appends are a single
+    INSERT under a lock; retention (config history_max / history_days) is
+    enforced by deleting through the id and timestamp indexes. An existing
+    history.json is imported once and renamed to history.json.migrated."""
+
+    def __init__(self, path, legacy=None):
+        self.path = path
+        self.legacy = legacy
+        self.db = None
+        self.lock = threading.Lock()
+
+    def _conn(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT, auto INTEGER,
+                    freed INTEGER, files INTEGER, entry TEXT);
+                CREATE INDEX IF NOT EXISTS history_ts ON history(ts);
+                CREATE TABLE IF NOT EXISTS history_cats (
+                    hid INTEGER REFERENCES history(id) ON DELETE CASCADE, cat TEXT,
+                    PRIMARY KEY (cat, hid)) WITHOUT ROWID;""")
+            self.db.execute("PRAGMA foreign_keys=ON")
+            self._migrate()
+        return self.db
+
+    def _insert(self, e):
+        cur = self.db.execute("INSERT INTO history (ts, auto, freed, files, entry) VALUES (?,?,?,?,?)",
+                              (e.get("timestamp", ""), int(bool(e.get("auto"))), e.get("total_freed_bytes", 0),
+                               e.get("total_files", 0), json.dumps(e, ensure_ascii=False)))
+        self.db.executemany("INSERT OR IGNORE INTO history_cats VALUES (?,?)",
+                            [(cur.lastrowid, c) for c in e.get("categories") or ()])
+        return cur.lastrowid
+
+    def _migrate(self):
+        if not self.legacy or not os.path.exists(self.legacy): return
+        try:
+            with open(self.legacy, 'r', encoding='utf-8') as f: old = json.load(f)
+        except: old = []
+        with self.db:
+            for e in reversed(old): self._insert(e)     # file is newest-first
+        try: os.replace(self.legacy, self.legacy + ".migrated")
+        except OSError: pass
+
+    def append(self, entry):
+        cfg = CONFIG.load(shared=True)
+        keep, days = cfg.get("history_max", 5000), cfg.get("history_days", 0)
+        with self.lock, self._conn() as db:
+            hid = self._insert(entry)
+            if keep: db.execute("DELETE FROM history WHERE id <= ?", (hid - keep,))
+            if days:
+                cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+                db.execute("DELETE FROM history WHERE ts < ?", (cutoff,))
+
+    @staticmethod
+    def _where(since=None, until=None, category=None, auto=None):
+        sql, args = [], []
+        if since: sql.append("ts >= ?"); args.append(since)
+        if until:
+            sql.append("ts <= ?"); args.append(until + " 23:59:59" if len(until) == 10 else until)
+        if category:
+            sql.append("id IN (SELECT hid FROM history_cats WHERE cat = ?)"); args.append(category)
+        if auto is not None: sql.append("auto = ?"); args.append(int(bool(auto)))
+        return (" WHERE " + " AND ".join(sql) if sql else ""), args
+
+    def query(self, limit=None, offset=0, **filters):
+        """Newest-first entries matching the filters (since/until date or
+        timestamp strings, category key, auto flag)."""
+        where, args = self._where(**filters)
+        with self.lock:
+            rows = self._conn().execute(f"SELECT entry FROM history{where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                                        args + [-1 if limit is None else limit, offset]).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def summary(self, **filters):
+        where, args = self._where(**filters)
+        with self.lock:
+            n, freed, files, auto = self._conn().execute(
+                f"SELECT COUNT(*), SUM(freed), SUM(files), SUM(auto) FROM history{where}", args).fetchone()
+        return {"count": n, "total_freed_bytes": freed or 0, "total_files": files or 0, "auto": auto or 0}
+
+    def clear(self):
+        with self.lock, self._conn() as db:
+            db.execute("DELETE FROM history")
+
+HISTORY = HistoryStore(HISTORY_DB, legacy=HISTORY_FILE)
 
 # ── Scheduler (pure Python thread) ────────────────────────────────────────────
 
-_scheduler_thread = None
-_scheduler_stop   = threading.Event()
+SCHED_DEFAULT = {"enabled": False, "interval_hours": 24, "categories": ["temp","browser","logs"],
+                 "min_age_days": 0, "jitter_minutes": 0, "last_run": None}
+SCHED_RECHECK = 60   # longest sleep; re-reads the wall clock after suspend/hibernate
 
-def load_schedule():
-    try:
-        if os.path.exists(SCHED_FILE):
-            with open(SCHED_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except: pass
-    return {"enabled": False, "interval_hours": 24, "categories": ["temp","browser","logs"], "last_run": None}
+SCHEDULE = JsonFile(SCHED_FILE, {"schedules": {}})
 
-def save_schedule(s):
-    try:
-        with open(SCHED_FILE, 'w', encoding='utf-8') as f:
-            json.dump(s, f, ensure_ascii=False, indent=2)
-    except: pass
+def load_schedules():
+    """{name: schedule}. A legacy single-schedule file reads as "default"."""
+    s = SCHEDULE.load()
+    if "schedules" not in s: s = {"schedules": {"default": s} if s else {}}
+    return {n: {**SCHED_DEFAULT, **v} for n, v in s["schedules"].items()}
 
-def _scheduler_worker():
-    while not _scheduler_stop.is_set():
-        s = load_schedule()
-        if s.get("enabled"):
-            last = s.get("last_run")
-            interval_h = s.get("interval_hours", 24)
-            run_now = False
-            if last is None:
-                run_now = True
-            else:
-                try:
-                    last_dt = datetime.fromisoformat(last)
-                    if datetime.now() - last_dt >= timedelta(hours=interval_h):
-                        run_now = True
-                except: run_now = True
-            if run_now:
-                cats = s.get("categories", ["temp","browser","logs"])
-                _do_clean(cats, 0, auto=True)
-                s["last_run"] = datetime.now().isoformat()
-                save_schedule(s)
-        _scheduler_stop.wait(300)  # check every 5 min
+def save_schedules(scheds):
+    try: SCHEDULE.save({"schedules": scheds})
+    except: pass
+    SCHEDULER.wake()
+
+def next_run(name, s, now=None):
+    """Exact next fire time of a schedule (None if disabled). The jitter is
+    derived from the last run, so it is stable across recomputations."""
+    if not s.get("enabled"): return None
+    try: last = datetime.fromisoformat(s["last_run"]) if s.get("last_run") else None
+    except ValueError: last = None
+    if last is None: return now or datetime.now()
+    jitter = random.Random(f"{name}|{s['last_run']}").uniform(0, float(s.get("jitter_minutes", 0)) * 60)
+    return last + timedelta(hours=float(s.get("interval_hours", 24)), seconds=jitter)
+
+class Scheduler:
+    """Sleeps until the earliest next_run of all schedules, or until woken
+    by a schedule change. Runs missed while the machine was off or asleep
+    are coalesced into one run; the number skipped is kept as `missed`."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.dirty = False
+        self.thread = None
+        self.fired = {}      # name -> last_run of runs made by this process
+
+    def effective(self, name, s):
+        """s with the last run kept in memory if it is newer than the stored
+        one, so a schedule file that cannot be written does not make the
+        same run due again right away."""
+        t = self.fired.get(name)
+        return dict(s, last_run=t) if t and (s.get("last_run") or "") < t else s
+
+    def wake(self):
+        with self.cond:
+            self.dirty = True
+            self.cond.notify_all()
+
+    def start(self):
+        if self.thread and self.thread.is_alive(): return
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            now = datetime.now(); wait = SCHED_RECHECK
+            try:
+                due = []
+                for n, s in load_schedules().items():
+                    try: t = next_run(n, self.effective(n, s), now)
+                    except (TypeError, ValueError, OverflowError): t = None   # broken entry
+                    if t: due.append((t, n))
+                if due:
+                    t, name = min(due)
+                    wait = (t - now).total_seconds()
+                    if wait <= 0:
+                        self._fire(name); continue
+            except Exception:
+                wait = SCHED_RECHECK
+            with self.cond:
+                if not self.dirty: self.cond.wait(min(wait, SCHED_RECHECK))
+                self.dirty = False
+
+    def _fire(self, name):
+        s = load_schedules().get(name)
+        if s is None: return
+        s = self.effective(name, s)
+        now = datetime.now(); missed = 0
+        if s.get("last_run"):
+            try:
+                late = now - datetime.fromisoformat(s["last_run"])
+                missed = max(0, int(late / timedelta(hours=float(s["interval_hours"]))) - 1)
+            except (KeyError, TypeError, ValueError, ZeroDivisionError): pass
+        self.fired[name] = now.isoformat(timespec="seconds")
+        try: _do_clean(s["categories"], s.get("min_age_days", 0), auto=True, schedule=name)
+        except Exception: pass
+        with SCHEDULE.lock:   # keep edits made while the clean ran
+            scheds = load_schedules()
+            if name in scheds:
+                scheds[name].update(last_run=now.isoformat(timespec="seconds"), missed=missed)
+                save_schedules(scheds)
+
+SCHEDULER = Scheduler()
 
 def start_scheduler():
-    global _scheduler_thread
-    if _scheduler_thread and _scheduler_thread.is_alive():
-        return
-    _scheduler_stop.clear()
-    _scheduler_thread = threading.Thread(target=_scheduler_worker, daemon=True)
-    _scheduler_thread.start()
+    SCHEDULER.start()
+
+
+# ── Background jobs ───────────────────────────────────────────────────────────
+
+JOB_WORKERS = int(os.environ.get("PYCLEANER_JOB_WORKERS") or 4)
+JOB_TTL     = 600   # seconds a finished job (and its result) is kept
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    """A long-running operation with progress counters and cooperative cancel."""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.status = "queued"          # queued | running | done | error | cancelled
+        self.files = 0; self.bytes = 0; self.current = ""
+        self.result = None; self.error = None
+        self.created = time.time(); self.started = None; self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def progress(self, path=None, nbytes=0, files=0):
+        """Add to the counters; safe to call from walker worker threads."""
+        with self._lock:
+            self.files += files; self.bytes += nbytes
+            if path: self.current = path
+
+    def check(self):
+        if self._cancel.is_set(): raise JobCancelled()
+
+    def to_dict(self, result=True):
+        d = {"id": self.id, "kind": self.kind, "status": self.status,
+             "files": self.files, "bytes": self.bytes, "bytes_fmt": fmt(self.bytes),
+             "current": self.current, "error": self.error,
+             "created": self.created, "started": self.started, "finished": self.finished,
+             "elapsed": round((self.finished or time.time()) - (self.started or self.created), 2)}
+        if result and self.status == "done": d["result"] = self.result
+        return d
+
+_job_local = threading.local()
+
+def current_job():
+    """The Job the calling thread is executing, if any."""
+    return getattr(_job_local, "job", None)
+
+def job_tick(path=None, nbytes=0, files=0):
+    """Report progress for the current job and honour cancellation."""
+    job = current_job()
+    if job is not None:
+        job.progress(path, nbytes, files); job.check()
+
+class JobManager:
+    """Runs jobs on a bounded executor and keeps finished ones for JOB_TTL."""
+
+    def __init__(self, workers, ttl):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.ttl = ttl
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def _reap(self):
+        now = time.time()
+        with self.lock:
+            for jid in [j.id for j in self.jobs.values() if j.finished and now - j.finished > self.ttl]:
+                del self.jobs[jid]
+
+    def _run(self, job, fn, args, kw):
+        if job.cancelled:
+            job.status = "cancelled"; job.finished = time.time(); return
+        job.status = "running"; job.started = time.time()
+        _job_local.job = job
+        try:
+            job.result = fn(*args, **kw)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "error"; job.error = str(e)
+        finally:
+            _job_local.job = None
+            job.finished = time.time()
+
+    def submit(self, kind, fn, *args, **kw):
+        self._reap()
+        job = Job(kind)
+        with self.lock: self.jobs[job.id] = job
+        self.pool.submit(self._run, job, fn, args, kw)
+        return job
+
+    def get(self, jid):
+        self._reap()
+        with self.lock: return self.jobs.get(jid)
+
+    def list(self):
+        self._reap()
+        with self.lock: return list(self.jobs.values())
+
+JOBS = JobManager(JOB_WORKERS, JOB_TTL)
+
+def job_response(job):
+    return jsonify({"job_id": job.id, "status": job.status,
+                    "url": f"/api/jobs/{job.id}"}), 202
+
+# ── Result cache ──────────────────────────────────────────────────────────────
+
+RESULT_TTL = float(os.environ.get("PYCLEANER_RESULT_TTL") or 30)   # seconds
+
+class _Flight:
+    def __init__(self, gen):
+        self.gen = gen
+        self.t0 = time.time()
+        self.done = threading.Event()
+        self.value = self.error = None
+
+class ResultCache:
+    """Single-flight + TTL cache for expensive read results. Concurrent
+    get()s of one key share a single computation; the result is kept for
+    `ttl` seconds. invalidate() drops everything, and a computation that
+    was running across an invalidation is returned but not cached. At most
+    `size` entries are kept (least recently used go first); expired ones
+    are swept whenever a result is stored."""
+
+    def __init__(self, ttl, size=64):
+        self.ttl = ttl
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = {}    # key -> (time, value)
+        self.flights = {}    # key -> _Flight
+        self.gen = 0
+
+    def peek(self, key, valid=None):
+        """(value, meta) if a fresh result is cached, else None."""
+        with self.lock:
+            e = self.entries.get(key)
+            self.entries.pop(key, None)
+            if e and time.time() - e[0] < self.ttl and (valid is None or valid(e[1])):
+                self.entries[key] = e    # most recently used last
+                return e[1], {"cached": True, "age": round(time.time() - e[0], 1)}
+
+    def get(self, key, fn, valid=None):
+        """(value, {"cached": bool, "age": seconds}) for key, computing it
+        with fn() unless cached or already being computed."""
+        while True:
+            hit = self.peek(key, valid)
+            if hit: return hit
+            with self.lock:
+                f = self.flights.get(key); leader = f is None
+                if leader: f = self.flights[key] = _Flight(self.gen)
+            if leader: return self._lead(key, f, fn)
+            job = current_job()
+            while not f.done.wait(0.5):
+                if job: job.check()
+            if isinstance(f.error, JobCancelled): continue    # the leader's job was cancelled
+            if f.error: raise f.error
+            return f.value, {"cached": True, "age": round(time.time() - f.t0, 1)}
+
+    def _lead(self, key, f, fn):
+        try:
+            f.value = fn()
+            return f.value, {"cached": False, "age": 0}
+        except BaseException as e:
+            f.error = e; raise
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+                if f.error is None and f.gen == self.gen:
+                    self._store(key, f.t0, f.value)
+            f.done.set()
+
+    def _store(self, key, t, value):
+        # caller holds the lock
+        now = time.time()
+        for k in [k for k, e in self.entries.items() if now - e[0] >= self.ttl]:
+            del self.entries[k]
+        self.entries.pop(key, None); self.entries[key] = (t, value)
+        while len(self.entries) > self.size:
+            del self.entries[next(iter(self.entries))]
+
+    def invalidate(self):
+        with self.lock:
+            self.gen += 1
+            self.entries.clear()
+
+RESULTS = ResultCache(RESULT_TTL)
+
+# ── Throttling ────────────────────────────────────────────────────────────────
+
+THROTTLE_CHECK = 1.0   # seconds between load / disk busy checks
+
+class TokenBucket:
+    """`rate` units per second with a one-second burst. A request larger
+    than the bucket goes into debt; take() returns the seconds to wait."""
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.tokens = self.rate
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, n):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= n
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+def _lower_thread_priority():
+    """nice 19 and the idle I/O class for the calling thread (Linux keeps
+    both per thread, new threads inherit them). One way only: without
+    privileges the old priority cannot be restored, so only call this on
+    threads that end with the throttled work."""
+    if SYSTEM != "Linux": return
+    tid = threading.get_native_id()
+    try: os.setpriority(os.PRIO_PROCESS, tid, 19)
+    except OSError: pass
+    if HAS_PSUTIL:
+        try: psutil.Process(tid).ionice(psutil.IOPRIO_CLASS_IDLE)
+        except (psutil.Error, OSError, AttributeError): pass
+
+class Throttle:
+    """Byte and operation budgets plus pausing while the system is busy.
+    tick() is called at each I/O point, from any thread."""
+
+    def __init__(self, mb_per_sec=0, ops_per_sec=0, low_priority=False, max_load=0, max_disk_busy=0):
+        self.bytes = TokenBucket(mb_per_sec * 1024**2) if mb_per_sec else None
+        self.ops = TokenBucket(ops_per_sec) if ops_per_sec else None
+        self.low_priority = low_priority
+        self.max_load = max_load
+        self.max_busy = max_disk_busy
+        self.lock = threading.Lock()
+        self.next_check = 0.0
+        self.busy_prev = None
+        self.waited = 0.0; self.paused = 0.0
+
+    @classmethod
+    def for_profile(cls, profile, auto=False):
+        mode = profile.get("throttle", "off")
+        if mode == "always" or (mode == "scheduled" and auto):
+            return cls(profile.get("throttle_mb_per_sec", 0), profile.get("throttle_ops_per_sec", 0),
+                       profile.get("throttle_low_priority", True), profile.get("throttle_max_load", 0),
+                       profile.get("throttle_max_disk_busy", 0))
+        return None
 
-start_scheduler()
+    def tick(self, nbytes=0, ops=0):
+        wait = 0.0
+        if nbytes and self.bytes: wait = self.bytes.take(nbytes)
+        if ops and self.ops: wait = max(wait, self.ops.take(ops))
+        if wait:
+            self._sleep(wait)
+            with self.lock: self.waited += wait
+        if (self.max_load or self.max_busy) and time.monotonic() >= self.next_check:
+            while self._overloaded():
+                self._sleep(THROTTLE_CHECK)
+                with self.lock: self.paused += THROTTLE_CHECK
+
+    def _overloaded(self):
+        with self.lock:
+            self.next_check = time.monotonic() + THROTTLE_CHECK
+            if self.max_load and hasattr(os, "getloadavg"):
+                if os.getloadavg()[0] / (os.cpu_count() or 1) > self.max_load: return True
+            if self.max_busy and HAS_PSUTIL:
+                try: now, io = time.monotonic(), psutil.disk_io_counters(perdisk=True)
+                except Exception: return False
+                prev, self.busy_prev = self.busy_prev, (now, io)
+                if prev and now > prev[0]:
+                    busy = max(((d.busy_time - prev[1][k].busy_time) / ((now - prev[0]) * 10)
+                                for k, d in io.items() if k in prev[1] and hasattr(d, "busy_time")), default=0)
+                    if busy > self.max_busy: return True
+            return False
+
+    @staticmethod
+    def _sleep(secs):
+        job = current_job(); end = time.monotonic() + secs
+        while (left := end - time.monotonic()) > 0:
+            time.sleep(min(left, 0.25))
+            if job: job.check()
+
+    def init_worker(self):
+        """Initializer for the per-run ThreadPoolExecutors: low priority."""
+        if self.low_priority: _lower_thread_priority()
+
+    def run(self, fn, *args):
+        """fn(*args) under this throttle. With low_priority it runs on a
+        thread of its own that is lowered and then discarded, so shared job
+        and request threads keep their priority; the current job carries
+        over and exceptions are re-raised here."""
+        if not self.low_priority: return fn(*args)
+        job = current_job(); out = {}
+        def body():
+            _job_local.job = job; _throttle_local.throttle = self
+            _lower_thread_priority()
+            try: out["result"] = fn(*args)
+            except BaseException as e: out["error"] = e
+        t = threading.Thread(target=body, daemon=True)
+        t.start(); t.join()
+        if "error" in out: raise out["error"]
+        return out["result"]
+
+    def stats(self):
+        return {"waited_sec": round(self.waited, 1), "paused_sec": round(self.paused, 1)}
+
+_throttle_local = threading.local()
+
+def current_throttle():
+    return getattr(_throttle_local, "throttle", None)
+
+def throttle_tick(nbytes=0, ops=0):
+    t = current_throttle()
+    if t is not None: t.tick(nbytes, ops)
+
+@contextlib.contextmanager
+def throttled(profile, auto=False):
+    """Run the block under the profile's throttle (if it applies); yields
+    the Throttle or None. Priority is not touched here: pass the work
+    through Throttle.run to get it on a low-priority thread."""
+    t = Throttle.for_profile(profile, auto)
+    if t is None:
+        yield None; return
+    prev = current_throttle(); _throttle_local.throttle = t
+    try: yield t
+    finally: _throttle_local.throttle = prev
+
+def run_throttled(thr, fn, *args):
+    return thr.run(fn, *args) if thr else fn(*args)
 
 # ── Filesystem helpers ─────────────────────────────────────────────────────────
 
@@ -150,22 +675,357 @@ def fmt(n):
     if n < 1024**3:     return f"{n/1024**2:.1f} MB"
     return f"{n/1024**3:.2f} GB"
 
-def dir_size(path):
-    total = 0
-    try:
-        for dp, _, fn in os.walk(path):
-            for f in fn:
-                try: total += os.path.getsize(os.path.join(dp, f))
-                except: pass
-    except: pass
-    return total
+class TreeStats(namedtuple("TreeStats", "bytes files dirs errors")):
+    """Aggregate of one tree traversal."""
+    __slots__ = ()
+    def __add__(self, o):
+        return TreeStats(*(x + y for x, y in zip(self, o)))
+
+# Concurrency of the parallel walker; 1 = serial walk in the calling thread
+WALK_WORKERS = int(os.environ.get("PYCLEANER_WALK_WORKERS") or min(32, (os.cpu_count() or 4) * 2))
+WALK_SPAWN = 64     # queued dirs before a walk brings up its helper threads
+
+class _TreeWalker:
+    """Work-stealing parallel scandir walker.
+
+    Every worker owns a deque of pending directories: it pushes/pops its own
+    end (depth-first, good locality) and idle workers steal from the other
+    end of a random victim. Per-directory results are merged in path order,
+    so the output does not depend on scheduling. The calling thread is
+    worker 0; the helpers are only started once WALK_SPAWN directories are
+    queued, so small trees are walked serially without thread start-up."""
+
+    def __init__(self, on_file=None, prune=None, workers=None, index=None):
+        self.on_file = on_file
+        self.prune = prune
+        self.workers = max(1, workers or WALK_WORKERS)
+        self.index = index if on_file is None else None
+        self.job = current_job()
+        self.deques = [deque() for _ in range(self.workers)]
+        self.results = {}
+        self.indexed = set()
+        self.pending = 0
+        self.cv = threading.Condition()
+        self.threads = None
+        self.error = None
+
+    def _visit(self, path, mine):
+        dst = None
+        if self.index is not None:
+            try: dst = os.stat(path)
+            except OSError: dst = None; self.index.forget(path)
+            hit = self.index.lookup(path, dst) if dst else None
+            if hit:
+                own, names = hit
+                subs = [os.path.join(path, n) for n in names
+                        if not (self.prune and self.prune(n, os.path.join(path, n)))]
+                self.results[path] = (own._replace(dirs=len(subs)), ())
+                self.indexed.add(path)
+                if self.job: self.job.progress(path, own.bytes, own.files)
+                self._push(subs, mine)
+                return
+        nbytes = files = dirs = errors = 0; items = []; subs = []; pruned = []
+        try:
+            with os.scandir(path) as it:
+                for e in it:
+                    try:
+                        if e.is_dir(follow_symlinks=False):
+                            if self.prune and self.prune(e.name, e.path):
+                                pruned.append(e.name); continue
+                            dirs += 1; subs.append(e.path)
+                        else:
+                            st = e.stat(follow_symlinks=False)
+                            nbytes += st.st_size; files += 1
+                            if self.on_file:
+                                v = self.on_file(e, st)
+                                if v is not None: items.append(v)
+                    except OSError:
+                        errors += 1
+        except OSError:
+            errors += 1
+        own = TreeStats(nbytes, files, dirs, errors)
+        self.results[path] = (own, items)
+        if self.job: self.job.progress(path, nbytes, files)
+        if dst is not None:
+            self.index.store(path, dst, own, [os.path.basename(p) for p in subs] + pruned)
+        self._push(subs, mine)
+
+    def _push(self, subs, mine):
+        if subs:
+            with self.cv:
+                self.pending += len(subs)
+                mine.extend(subs)
+                self.cv.notify(len(subs))
+                spawn = self.threads is None and self.workers > 1 and self.pending >= WALK_SPAWN
+                if spawn: self.threads = []
+            if spawn: self._spawn()
+
+    def _spawn(self):
+        for i in range(1, self.workers):
+            t = threading.Thread(target=self._worker, args=(i,), daemon=True)
+            t.start(); self.threads.append(t)
+
+    def _steal(self, i):
+        n = self.workers
+        start = random.randrange(n)
+        for k in range(n):
+            j = (start + k) % n
+            if j == i: continue
+            try: return self.deques[j].popleft()
+            except IndexError: pass
+        return None
 
-def count_files(path):
-    n = 0
-    try:
-        for _, _, fn in os.walk(path): n += len(fn)
-    except: pass
-    return n
+    def _worker(self, i):
+        mine = self.deques[i]
+        while True:
+            if self.error is not None or (self.job and self.job.cancelled): return
+            try:
+                path = mine.pop()
+            except IndexError:
+                path = self._steal(i)
+                if path is None:
+                    with self.cv:
+                        if self.pending == 0: return
+                        self.cv.wait(0.05)
+                    continue
+            try:
+                self._visit(path, mine)
+            except BaseException as e:
+                with self.cv:
+                    if self.error is None: self.error = e
+                    self.cv.notify_all()
+                return
+            finally:
+                with self.cv:
+                    self.pending -= 1
+                    if self.pending == 0: self.cv.notify_all()
+
+    def run(self, roots):
+        roots = [r for r in dict.fromkeys(roots)]
+        self.pending = len(roots)
+        self.deques[0].extend(reversed(roots))
+        if self.workers > 1 and len(roots) >= WALK_SPAWN:
+            self.threads = []; self._spawn()
+        self._worker(0)
+        for t in self.threads or (): t.join()
+        if self.error is not None: raise self.error
+        if self.job: self.job.check()
+        total = TreeStats(0, 0, 0, 0); items = []
+        for path in sorted(self.results):
+            st, its = self.results[path]
+            total += st; items.extend(its)
+        return total, items
+
+    def report(self):
+        """How much of the last run was served from the scan index."""
+        hit = [self.results[p][0] for p in self.indexed]
+        return {"dirs_from_index": len(hit), "dirs_scanned": len(self.results) - len(hit),
+                "bytes_from_index": sum(st.bytes for st in hit),
+                "files_from_index": sum(st.files for st in hit)}
+
+def walk_tree(roots, on_file=None, prune=None, workers=None, index=None, report=None):
+    """Walk one or more trees in parallel. on_file(entry, stat) may return a
+    value to collect (None = skip); prune(name, path) -> True skips a subtree.
+    With an index (plain accounting only) unchanged directories are served
+    from it; their index counters are added to the `report` dict if given.
+    Returns (TreeStats, items) with items in deterministic path order."""
+    if isinstance(roots, str): roots = [roots]
+    w = _TreeWalker(on_file, prune, workers, index)
+    res = w.run(roots)
+    _add_report(w, report)
+    return res
+
+def _add_report(w, report):
+    if report is not None and w.index is not None:
+        for k, v in w.report().items():
+            report[k] = report.get(k, 0) + v
+
+def tree_stats(path, workers=None, index=None, report=None):
+    """Bytes, file count, dir count and errors of a tree in one scandir pass.
+    Symlinks are counted as entries, never followed."""
+    return walk_tree(path, workers=workers, index=index, report=report)[0]
+
+def child_stats(path, workers=None, index=None, report=None):
+    """TreeStats of every immediate subdirectory of `path`, from one walk of
+    `path` (the per-directory results summed by top-level prefix)."""
+    w = _TreeWalker(workers=workers, index=index)
+    w.run([path])
+    _add_report(w, report)
+    base = os.path.join(path, ""); n = len(base); out = {}
+    for p, (st, _) in w.results.items():
+        if not p.startswith(base): continue
+        top = base + p[n:].split(os.sep, 1)[0]
+        out[top] = out[top] + st if top in out else st
+    return out
+
+# ── Scan index ─────────────────────────────────────────────────────────────────
+
+class ScanIndex:
+    """Persistent per-directory aggregates keyed on directory mtime/inode.
+
+    Each entry holds the directory's own files (not its subtree) and its
+    subdirectory names. A directory whose mtime_ns and inode are unchanged
+    has the same entries, so a rescan only stats it and descends into the
+    recorded subdirectories; only changed directories are listed again.
+    Files rewritten in place (same name) keep their indexed size until the
+    directory changes or is invalidated by a clean."""
+
+    def __init__(self, path):
+        self.path = path
+        self.dirs = None
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if self.dirs is not None: return
+        with self.lock:
+            if self.dirs is not None: return
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.dirs = data.get("dirs", {}) if data.get("version") == 1 else {}
+            except: self.dirs = {}
+
+    def lookup(self, path, st):
+        self._load()
+        with self.lock:
+            e = self.dirs.get(path)
+        if e is None or e[0] != st.st_mtime_ns or e[1] != st.st_ino:
+            return None
+        return TreeStats(e[2], e[3], len(e[5]), e[4]), e[5]
+
+    def store(self, path, st, own, names):
+        """Record a listed directory. Recorded subdirectories missing from
+        the new listing are dropped together with their subtrees."""
+        self._load()
+        with self.lock:
+            old = self.dirs.get(path)
+            self.dirs[path] = [st.st_mtime_ns, st.st_ino, own.bytes, own.files, own.errors, names]
+            self.dirty = True
+            if old:
+                keep = set(names)
+                for n in old[5]:
+                    if n not in keep: self._drop(os.path.join(path, n))
+
+    def forget(self, path):
+        """Drop a directory that is no longer there, with its subtree."""
+        self._load()
+        with self.lock: self._drop(path)
+
+    def _drop(self, path):
+        # Follows the recorded names, so the cost is that of the dropped subtree.
+        stack = [path]
+        while stack:
+            p = stack.pop()
+            e = self.dirs.pop(p, None)
+            if e is None: continue
+            self.dirty = True
+            stack.extend(os.path.join(p, n) for n in e[5])
+
+    def _under(self, roots):
+        roots = [r.rstrip(os.sep) for r in roots]
+        seps = [r + os.sep for r in roots]
+        return lambda p: p in roots or any(p.startswith(x) for x in seps)
+
+    def invalidate(self, paths):
+        """Forget the given directories and everything below them."""
+        self._load()
+        under = self._under(paths)
+        with self.lock:
+            gone = [p for p in self.dirs if under(p)]
+            for p in gone: del self.dirs[p]
+            if gone: self.dirty = True
+
+    def save(self):
+        if not self.dirty: return
+        with self.lock:
+            snap = dict(self.dirs); self.dirty = False
+        try: write_json_atomic(self.path, {"version": 1, "dirs": snap})
+        except: self.dirty = True
+
+SCAN_INDEX = ScanIndex(INDEX_FILE)
+
+# ── Disk usage tree ────────────────────────────────────────────────────────────
+
+TREE_TTL = 300   # seconds a computed subtree map is reused for drill-down
+
+class DiskTreeCache:
+    """Bottom-up subtree totals of walked roots. A request for any directory
+    inside a cached root is answered from that root's map without walking."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.trees = {}     # root -> (built_at, {path: [bytes, files, dirs, own_bytes, own_files]}, {path: [children]})
+        self.lock = threading.Lock()
+
+    def find(self, path):
+        now = time.time()
+        with self.lock:
+            for root, (t, totals, kids) in list(self.trees.items()):
+                if now - t > self.ttl: del self.trees[root]; continue
+                if path in totals: return totals, kids, now - t
+        return None
+
+    def build(self, root):
+        w = _TreeWalker(index=SCAN_INDEX)
+        w.run([root])
+        SCAN_INDEX.save()
+        totals = {}; kids = defaultdict(list)
+        for p, (own, _) in w.results.items():
+            totals[p] = [own.bytes, own.files, own.dirs, own.bytes, own.files]
+            if p != root: kids[os.path.dirname(p)].append(p)
+        for p in sorted(totals, key=lambda x: x.count(os.sep), reverse=True):
+            if p == root: continue
+            t = totals[p]; u = totals[os.path.dirname(p)]
+            u[0] += t[0]; u[1] += t[1]; u[2] += t[2]
+        kids = dict(kids)
+        with self.lock: self.trees[root] = (time.time(), totals, kids)
+        return totals, kids
+
+    def invalidate(self, paths):
+        """Drop every cached tree that contains or lies inside one of paths."""
+        with self.lock:
+            for root in list(self.trees):
+                if any(p == root or p.startswith(root.rstrip(os.sep) + os.sep) or
+                       root.startswith(p.rstrip(os.sep) + os.sep) for p in paths):
+                    del self.trees[root]
+
+DISK_TREES = DiskTreeCache(TREE_TTL)
+
+def tree_changed(dirs, index=True):
+    """Forget what is cached about `dirs` after files in them were deleted,
+    replaced or restored: disk trees, read results and, with index, the
+    scan index. Removing or renaming a file moves its directory's mtime,
+    which the index notices by itself, so single-file changes skip it."""
+    dirs = list(dict.fromkeys(dirs))
+    if dirs:
+        if index: SCAN_INDEX.invalidate(dirs); SCAN_INDEX.save()
+        DISK_TREES.invalidate(dirs)
+    RESULTS.invalidate()
+
+def disk_tree(root, depth=2, top=10):
+    """Size tree of root, `depth` levels deep, at most `top` children per node
+    (the rest folded into "other"). Reuses a cached subtree map if one covers root."""
+    root = os.path.abspath(root)
+    hit = DISK_TREES.find(root)
+    if hit: totals, kids, age = hit
+    else: (totals, kids), age = DISK_TREES.build(root), None
+    def node(p, d):
+        t = totals[p]
+        n = {"name": os.path.basename(p) or p, "path": p, "size": t[0], "size_fmt": fmt(t[0]),
+             "files": t[1], "dirs": t[2], "own_size": t[3], "own_files": t[4]}
+        if d > 0:
+            ch = heapq.nlargest(top, kids.get(p, []), key=lambda c: totals[c][0])
+            n["children"] = [node(c, d - 1) for c in ch]
+            rest = len(kids.get(p, [])) - len(ch)
+            if rest > 0:
+                rb = t[0] - t[3] - sum(totals[c][0] for c in ch)
+                n["other"] = {"dirs": rest, "size": rb, "size_fmt": fmt(rb)}
+        return n
+    res = node(root, depth)
+    res["cached"] = hit is not None
+    res["age"] = round(age, 1) if age is not None else 0
+    return res
 
 def get_temp_dirs():
     d = [tempfile.gettempdir()]
@@ -221,132 +1081,818 @@ def get_thumb_dirs():
     else: d = []
     return [x for x in d if os.path.exists(x)]
 
-def clean_dir(path, subdirs=True, min_age=0):
-    removed=0; errors=0; freed=0; now=time.time()
+def _unlink(path):
+    """Remove a file, clearing a read-only flag if needed (put back if the
+    remove still fails)."""
+    throttle_tick(ops=1)
+    try: os.remove(path)
+    except PermissionError:
+        mode = stat.S_IMODE(os.lstat(path).st_mode)
+        os.chmod(path, stat.S_IWRITE)
+        try: os.remove(path)
+        except OSError:
+            try: os.chmod(path, mode)
+            except OSError: pass
+            raise
+
+def delete_tree(path, on_file=None):
+    """Delete a tree bottom-up in a single scandir pass, summing the sizes
+    from the same stat; on_file(path, size) runs just before each unlink.
+    Returns (files removed, errors, bytes freed); only entries that were
+    really removed are counted as freed."""
+    removed = errors = freed = 0; job = current_job()
+    stack = [(path, False)]
+    while stack:
+        p, listed = stack.pop()
+        if listed:
+            try: os.rmdir(p)
+            except FileNotFoundError: pass
+            except OSError as ex:
+                if ex.errno != errno.ENOTEMPTY: errors += 1   # else a child failure, already counted
+            continue
+        stack.append((p, True))
+        n = b = 0
+        try:
+            with os.scandir(p) as it:
+                for e in it:
+                    try:
+                        if e.is_dir(follow_symlinks=False):
+                            stack.append((e.path, False)); continue
+                        sz = e.stat(follow_symlinks=False).st_size
+                        if on_file: on_file(e.path, sz)
+                        _unlink(e.path)
+                        n += 1; b += sz
+                    except FileNotFoundError: pass
+                    except OSError: errors += 1
+        except OSError:
+            errors += 1
+        removed += n; freed += b
+        if job: job.progress(p, b, n); job.check()
+    return removed, errors, freed
+
+CLEAN_LABELS = {"temp":"Ideiglenes fájlok","browser":"Böngésző cache","logs":"Log fájlok",
+                "thumbnails":"Bélyegkép cache","trash":"Lomtár","custom":"Egyéni mappák"}
+
+def get_trash_dirs():
+    if SYSTEM == "Linux":
+        d = [os.path.expanduser("~/.local/share/Trash/files"), os.path.expanduser("~/.local/share/Trash/info")]
+    elif SYSTEM == "Darwin": d = [os.path.expanduser("~/.Trash")]
+    else: d = []
+    return [x for x in d if os.path.exists(x)]
+
+def clean_dirs_map(profile):
+    dirs_map = {
+        "temp":       get_temp_dirs(),
+        "browser":    get_browser_dirs(),
+        "logs":       get_log_dirs(),
+        "thumbnails": get_thumb_dirs(),
+        "trash":      get_trash_dirs(),
+    }
+    # Custom dirs from profile
+    for cd in profile.get("custom_dirs", []):
+        if os.path.exists(cd):
+            dirs_map.setdefault("custom", []).append(cd)
+    return dirs_map
+
+# ── Selection rules ───────────────────────────────────────────────────────────
+
+# A rule applies to the scopes in "scope" (clean categories, "duplicates",
+# "large_files" or "*"). "dir" (names/globs, or absolute paths) excludes whole
+# subtrees; otherwise "ext", "glob" (name, or full path if it has a slash)
+# and "regex" (searched in the full path) select files, narrowed by
+# min/max_age_days and min/max_size_kb. Without name matchers a rule
+# matches every file. A scope with include rules selects only what they
+# match; exclude rules always win.
+DEFAULT_RULES = [
+    {"scope": ["logs"], "action": "include", "ext": [".log", ".old", ".bak", ".tmp"]},
+    {"scope": ["duplicates", "large_files"], "action": "exclude",
+     "dir": ["node_modules", "__pycache__", "$Recycle.Bin", "System Volume Information", "Windows", ".*"]},
+    {"scope": ["large_files"], "action": "exclude", "dir": ["Program Files", "Program Files (x86)"]},
+]
+
+DIR_RULE_CONFLICTS = ("ext", "glob", "regex", "min_age_days", "max_age_days", "min_size_kb", "max_size_kb")
+
+def _as_list(v):
+    return [] if v is None else [v] if isinstance(v, str) else list(v)
+
+def _combine(patterns):
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.I if SYSTEM == "Windows" else 0) if patterns else None
+
+class RuleSet:
+    """The rules of one scope compiled into a single matcher: per distinct
+    (age, size) condition one extension set plus one combined regex each
+    for names and paths; subtree exclusions become one prune predicate."""
+
+    def __init__(self, rules, scope):
+        rules = [r for r in rules if "*" in _as_list(r.get("scope", "*")) or scope in _as_list(r.get("scope", "*"))]
+        names, name_pats, paths, path_pats = set(), [], [], []
+        clauses = {"include": {}, "exclude": {}}
+        for r in rules:
+            action = r.get("action", "exclude")
+            if action not in clauses: raise ValueError(f"Ismeretlen művelet: {action}")
+            if "dir" in r:
+                # a dir rule prunes whole subtrees: only as an exclusion, on its own
+                if action != "exclude": raise ValueError("mappa (dir) csak kizáró szabályban adható meg")
+                extra = [k for k in DIR_RULE_CONFLICTS if r.get(k) not in (None, "", [])]
+                if extra: raise ValueError(f"a mappa (dir) nem kombinálható ezekkel: {', '.join(extra)}")
+            for d in _as_list(r.get("dir")):
+                if os.path.isabs(d):
+                    if any(c in d for c in "*?["): path_pats.append(fnmatch.translate(d))
+                    else: paths.append(os.path.normpath(d))
+                elif any(c in d for c in "*?["): name_pats.append(fnmatch.translate(d))
+                else: names.add(d)
+            if "dir" in r: continue
+            cond = (float(r.get("min_age_days") or 0) * 86400, float(r.get("max_age_days") or 0) * 86400,
+                    int(float(r.get("min_size_kb") or 0) * 1024), int(float(r.get("max_size_kb") or 0) * 1024))
+            c = clauses[action].setdefault(cond, {"exts": set(), "name": [], "path": [], "any": False})
+            exts, globs, regexes = _as_list(r.get("ext")), _as_list(r.get("glob")), _as_list(r.get("regex"))
+            c["exts"].update(("." + e.lstrip(".")).lower() for e in exts)
+            for g in globs: c["path" if "/" in g or os.sep in g else "name"].append(fnmatch.translate(g))
+            for x in regexes: re.compile(x); c["path"].append(f".*?(?:{x})")
+            if not (exts or globs or regexes): c["any"] = True
+        self.names = frozenset(names)
+        self.name_re = _combine(name_pats)
+        self.paths = tuple(paths)
+        self.path_re = _combine(path_pats)
+        self.include = [(cond, frozenset(c["exts"]), _combine(c["name"]), _combine(c["path"]), c["any"])
+                        for cond, c in clauses["include"].items()]
+        self.exclude = [(cond, frozenset(c["exts"]), _combine(c["name"]), _combine(c["path"]), c["any"])
+                        for cond, c in clauses["exclude"].items()]
+        self.active = bool(self.include or self.exclude or self.names or self.name_re or self.paths or self.path_re)
+
+    def prune(self, name, path):
+        """walk_tree prune predicate: True if the subtree is excluded."""
+        if name in self.names or (self.name_re and self.name_re.match(name)): return True
+        if self.paths and any(path == p or path.startswith(p + os.sep) for p in self.paths): return True
+        return bool(self.path_re and self.path_re.match(path))
+
+    @staticmethod
+    def _hit(clauses, name, path, st, now):
+        ext = os.path.splitext(name)[1].lower()
+        for (min_age, max_age, min_size, max_size), exts, name_re, path_re, any_ in clauses:
+            age = now - st.st_mtime
+            if min_age and age < min_age: continue
+            if max_age and age > max_age: continue
+            if min_size and st.st_size < min_size: continue
+            if max_size and st.st_size > max_size: continue
+            if any_ or ext in exts or (name_re and name_re.match(name)) or (path_re and path_re.match(path)):
+                return True
+        return False
+
+    def match(self, name, path, st, now=None):
+        """True if a file is selected: no exclude rule hits and, if the scope
+        has include rules, one of them does."""
+        now = now or time.time()
+        if self.exclude and self._hit(self.exclude, name, path, st, now): return False
+        return not self.include or self._hit(self.include, name, path, st, now)
+
+_RULE_CACHE = {}
+
+def compile_rules(profile, scope):
+    """RuleSet for DEFAULT_RULES + the profile's rules, cached per rule text."""
+    key = (json.dumps(profile.get("rules", []), sort_keys=True), scope)
+    rs = _RULE_CACHE.get(key)
+    if rs is None:
+        if len(_RULE_CACHE) > 64: _RULE_CACHE.clear()
+        rs = _RULE_CACHE[key] = RuleSet(DEFAULT_RULES + list(profile.get("rules", [])), scope)
+    return rs
+
+def check_rules(rules):
+    """Error message for an invalid rule list, None if it compiles."""
+    if not isinstance(rules, list) or not all(isinstance(r, dict) for r in rules):
+        return "A szabályok listája érvénytelen"
     try:
-        for item in os.listdir(path):
-            ip = os.path.join(path, item)
+        for scope in (*CLEAN_LABELS, "duplicates", "large_files"): RuleSet(rules, scope)
+    except re.error as e: return f"Hibás reguláris kifejezés: {e}"
+    except (ValueError, TypeError) as e: return f"Hibás szabály: {e}"
+    return None
+
+# ── Clean plan ─────────────────────────────────────────────────────────────────
+
+PLAN_TTL = 900   # seconds an unused plan is kept server-side
+
+# One deletable item: a whole top-level entry of a category dir, or a single
+# matching file wherever a category has selection rules (logs always does).
+# path is None for the Windows recycle bin.
+PlanEntry = namedtuple("PlanEntry", "cat path is_dir size files mtime_ns")
+
+class CleanPlan:
+    """Exactly what a clean will delete, built in one traversal. The preview,
+    the backup and the clean itself all read the same entries."""
+
+    def __init__(self, categories, min_age, entries, roots):
+        self.id = uuid.uuid4().hex[:12]
+        self.created = time.time()
+        self.categories = list(categories)
+        self.min_age = min_age
+        self.entries = entries
+        self.roots = roots          # [(cat, dir, mtime_ns)]
+        self.stale = False
+
+    def by_cat(self, cat):
+        return [e for e in self.entries if e.cat == cat]
+
+    def matches(self, dirs_map):
+        """True if the plan's category dirs are still the configured ones."""
+        want = {(c, d) for c in self.categories if not (c == "trash" and SYSTEM == "Windows")
+                for d in dirs_map.get(c, []) if os.path.exists(d)}
+        return want == {(c, d) for c, d, _ in self.roots}
+
+    def base_of(self, path):
+        """Parent of the category root holding path (archive names are relative to it)."""
+        for _, d, _ in self.roots:
+            if path.startswith(d.rstrip(os.sep) + os.sep): return os.path.dirname(d)
+        return os.path.dirname(path)
+
+    def totals(self):
+        t = {c: {"size": 0, "files": 0, "entries": 0} for c in self.categories}
+        for e in self.entries:
+            x = t.setdefault(e.cat, {"size": 0, "files": 0, "entries": 0})
+            x["size"] += e.size; x["files"] += e.files; x["entries"] += 1
+        for x in t.values(): x["size_fmt"] = fmt(x["size"])
+        return t
+
+    def summary(self):
+        size = sum(e.size for e in self.entries)
+        return {"id": self.id, "created": self.created, "categories": self.categories,
+                "min_age_days": self.min_age, "stale": self.stale,
+                "entries": len(self.entries), "size": size, "size_fmt": fmt(size),
+                "totals": self.totals()}
+
+    def revalidate(self):
+        """Cheap staleness check by mtime: a root whose mtime moved may hold
+        new items (marks the plan stale, they are not added); entries that
+        vanished are dropped, files modified since the preview are dropped
+        so nothing newer than what was shown gets deleted."""
+        dropped = 0; keep = []
+        for _, d, mt in self.roots:
             try:
-                if min_age > 0 and (now - os.path.getmtime(ip))/86400 < min_age:
-                    continue
-                sz = dir_size(ip) if os.path.isdir(ip) else os.path.getsize(ip)
-                if os.path.isfile(ip):
-                    os.chmod(ip, stat.S_IWRITE); os.remove(ip)
-                    removed += 1; freed += sz
-                elif os.path.isdir(ip) and subdirs:
-                    shutil.rmtree(ip, ignore_errors=True)
-                    removed += 1; freed += sz
-            except: errors += 1
-    except: errors += 1
-    return removed, errors, freed
+                if os.stat(d).st_mtime_ns != mt: self.stale = True
+            except OSError: self.stale = True
+        for e in self.entries:
+            if e.path is None: keep.append(e); continue
+            try: st = os.lstat(e.path)
+            except OSError: dropped += 1; continue
+            if st.st_mtime_ns != e.mtime_ns:
+                self.stale = True
+                if not e.is_dir: dropped += 1; continue
+            keep.append(e)
+        self.entries = keep
+        return {"stale": self.stale, "dropped": dropped, "entries": len(keep)}
+
+class PlanStore:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.plans = {}
+        self.lock = threading.Lock()
+
+    def put(self, plan):
+        now = time.time()
+        with self.lock:
+            for pid in [p.id for p in self.plans.values() if now - p.created > self.ttl]:
+                del self.plans[pid]
+            self.plans[plan.id] = plan
+
+    def get(self, pid):
+        with self.lock:
+            p = self.plans.get(pid)
+            if p and time.time() - p.created > self.ttl:
+                del self.plans[pid]; p = None
+            return p
+
+    def drop(self, pid):
+        with self.lock: self.plans.pop(pid, None)
+
+    def clear(self):
+        with self.lock: self.plans.clear()
+
+PLANS = PlanStore(PLAN_TTL)
+
+def _recycle_bin_dirs():
+    return [os.path.join(f"{chr(d)}:\\", "$Recycle.Bin") for d in range(65,91)
+            if os.path.exists(os.path.join(f"{chr(d)}:\\", "$Recycle.Bin"))]
+
+def build_plan(categories, min_age=0, profile=None, report=None):
+    """List everything a clean of `categories` would delete, with sizes, in
+    one traversal: top-level entries of each category dir old enough for
+    min_age (sized from a single indexed walk of the dir), or, where the
+    category has selection rules, each matching file of a walk pruned by
+    those rules.
+    Trash ignores min_age, as it always has."""
+    profile = profile or get_profile()
+    dirs_map = clean_dirs_map(profile)
+    now_ns = time.time_ns()
+    entries = []; roots = []; seen = set()
+    for cat in categories:
+        age_ns = 0 if cat == "trash" else int(min_age * 86400 * 1e9)
+        if cat == "trash" and SYSTEM == "Windows":
+            st = TreeStats(0, 0, 0, 0)
+            for rb in _recycle_bin_dirs():
+                st += tree_stats(rb, index=SCAN_INDEX, report=report)
+            entries.append(PlanEntry(cat, None, True, st.bytes, st.files, 0))
+            continue
+        for d in dirs_map.get(cat, []):
+            try: roots.append((cat, d, os.stat(d).st_mtime_ns))
+            except OSError: continue
+            rules = compile_rules(profile, cat)
+            if rules.active:
+                def pick(e, st, cat=cat, rules=rules):
+                    if (age_ns and now_ns - st.st_mtime_ns < age_ns) or not rules.match(e.name, e.path, st, now_ns / 1e9):
+                        return None
+                    return PlanEntry(cat, e.path, False, st.st_size, 1, st.st_mtime_ns)
+                found = walk_tree(d, on_file=pick, prune=rules.prune)[1]
+            else:
+                found = []; subs = None
+                try:
+                    with os.scandir(d) as it:
+                        for e in it:
+                            job_tick(e.path)
+                            try:
+                                st = e.stat(follow_symlinks=False)
+                                if age_ns and now_ns - st.st_mtime_ns < age_ns: continue
+                                if e.is_dir(follow_symlinks=False):
+                                    if subs is None:
+                                        subs = child_stats(d, index=SCAN_INDEX, report=report)
+                                    ts = subs.get(e.path) or TreeStats(0, 0, 0, 0)
+                                    found.append(PlanEntry(cat, e.path, True, ts.bytes, ts.files, st.st_mtime_ns))
+                                else:
+                                    found.append(PlanEntry(cat, e.path, False, st.st_size, 1, st.st_mtime_ns))
+                            except OSError: pass
+                except OSError: pass
+            for pe in found:
+                if pe.path in seen: continue   # dirs shared by two categories
+                seen.add(pe.path); entries.append(pe)
+    SCAN_INDEX.save()
+    plan = CleanPlan(categories, min_age, entries, roots)
+    PLANS.put(plan)
+    return plan
 
 # ── Backup before clean ────────────────────────────────────────────────────────
 
-def create_backup(categories, dirs_map):
-    """Zip up to backup_max_mb worth of files before deletion."""
+BACKUP_WORKERS = int(os.environ.get("PYCLEANER_BACKUP_WORKERS") or min(4, os.cpu_count() or 2))
+BACKUP_WINDOW  = 64 * 1024**2   # bytes read but not yet written to the archive
+MEMBER_MAX     = 8 * 1024**2    # larger files are streamed by the writer itself
+PROBE_SIZE     = 64 * 1024
+# Formats that are already compressed; deflating them again only burns CPU
+STORE_EXTS = frozenset(
+    ".jpg .jpeg .png .gif .webp .avif .heic .mp3 .ogg .opus .m4a .aac .flac .mp4 .m4v "
+    ".mkv .webm .avi .mov .zip .gz .tgz .bz2 .xz .7z .rar .zst .br .lz4 .cab .jar .apk "
+    ".docx .xlsx .pptx .odt .woff .woff2 .pdf".split())
+
+def _pick_method(name, probe):
+    """ZIP_STORED for known compressed formats and for data whose first
+    PROBE_SIZE bytes do not shrink by at least 10% at zlib level 1."""
+    if os.path.splitext(name)[1].lower() in STORE_EXTS or not probe:
+        return zipfile.ZIP_STORED
+    if len(zlib.compress(probe, 1)) > 0.9 * len(probe):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+def _compress_member(zinfo, data, raw=False):
+    """Worker side: choose the method and produce the member's payload
+    (with raw, leave the compression to ZipFile.open on the writer)."""
+    zinfo.compress_type = _pick_method(zinfo.filename, data[:PROBE_SIZE])
+    zinfo.file_size = len(data)
+    if raw: return zinfo, data
+    zinfo.CRC = zlib.crc32(data)
+    if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+        c = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        payload = c.compress(data) + c.flush()
+    else:
+        payload = data
+    zinfo.compress_size = len(payload)
+    return zinfo, payload
+
+# Appending precompressed members has no public zipfile API; it goes through
+# ZipFile internals that are the same on these CPython versions. Elsewhere,
+# or if any of them is missing, members are compressed by ZipFile.open('w').
+ZIP_FAST_PY    = ((3, 8), (3, 13))
+ZIP_FAST_ATTRS = ("_lock", "_writecheck", "_didModify", "_writing", "_seekable", "start_dir",
+                  "fp", "filelist", "NameToInfo")
+
+def _zip_fast_ok(zf):
+    return (ZIP_FAST_PY[0] <= sys.version_info[:2] <= ZIP_FAST_PY[1]
+            and all(hasattr(zf, a) for a in ZIP_FAST_ATTRS) and zf._seekable is True)
+
+def _zip_append(zf, zinfo, payload):
+    """Append a member whose payload is already compressed. Mirrors what
+    ZipFile.open(mode='w') does, minus the compression step; only used
+    when _zip_fast_ok(zf)."""
+    with zf._lock:
+        if zf._writing: raise ValueError("zip write handle open")
+        zf.fp.seek(zf.start_dir)
+        zinfo.header_offset = zf.fp.tell()
+        zf._writecheck(zinfo)
+        zf._didModify = True
+        zf.fp.write(zinfo.FileHeader())
+        zf.fp.write(payload)
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+        zf.start_dir = zf.fp.tell()
+
+def _zip_write(zf, zinfo, data):
+    """Public-API fallback: ZipFile compresses `data` with zinfo's method."""
+    with zf.open(zinfo, 'w') as w: w.write(data)
+
+class BackupWriter:
+    """Backup zip filled during the clean itself: each file is archived right
+    before it is deleted, so data is read once and the disk never holds the
+    whole backup next to the originals. Once backup_max_mb is used up the
+    clean continues delete-only.
+
+    Files are read by the cleaning thread and compressed on a worker pool
+    (STORED or DEFLATED per file); this thread is the only one writing to
+    the archive, appending finished members in order. Without the zipfile
+    fast path (see ZIP_FAST_PY) workers only pick the method and this
+    thread compresses through ZipFile.open."""
+
+    def __init__(self, path, max_bytes, workers=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.added = 0
+        self.full = False
+        self.zf = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+        self.fast = _zip_fast_ok(self.zf)
+        self.throttle = thr = current_throttle()
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers or BACKUP_WORKERS),
+                                       initializer=thr.init_worker if thr else None)
+        self.pending = deque(); self.inflight = 0
+        self.bytes_in = 0; self.bytes_out = 0; self.stored = 0; self.deflated = 0
+        self.t0 = time.time()
+
+    def add(self, fp, arcname, size):
+        if self.full: return
+        if self.added + size > self.max_bytes:
+            if self.added >= self.max_bytes: self.full = True
+            return
+        if self.throttle: self.throttle.tick(nbytes=size)
+        try:
+            if size > MEMBER_MAX:
+                with open(fp, 'rb') as f: probe = f.read(PROBE_SIZE)
+                self.zf.write(fp, arcname, compress_type=_pick_method(fp, probe))
+                self._count(self.zf.filelist[-1])
+            else:
+                zinfo = zipfile.ZipInfo.from_file(fp, arcname)
+                with open(fp, 'rb') as f: data = f.read()
+                self.pending.append(self.pool.submit(_compress_member, zinfo, data, not self.fast))
+                self.inflight += len(data)
+                while self.inflight > BACKUP_WINDOW: self._write_one()
+            self.added += size
+        except (OSError, ValueError): pass
+
+    def _count(self, zinfo):
+        self.bytes_in += zinfo.file_size; self.bytes_out += zinfo.compress_size
+        if zinfo.compress_type == zipfile.ZIP_STORED: self.stored += 1
+        else: self.deflated += 1
+
+    def _write_one(self):
+        zinfo, payload = self.pending.popleft().result()
+        self.inflight -= zinfo.file_size
+        if self.fast: _zip_append(self.zf, zinfo, payload)
+        else: _zip_write(self.zf, zinfo, payload)
+        self._count(zinfo)
+
+    def stats(self):
+        dt = max(time.time() - self.t0, 1e-6)
+        return {"files": self.stored + self.deflated, "stored": self.stored, "deflated": self.deflated,
+                "bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else 1.0,
+                "mb_per_sec": round(self.bytes_in / 1024**2 / dt, 1)}
+
+    def close(self):
+        """Finish the archive; returns its path, or None if nothing was stored."""
+        try:
+            while self.pending: self._write_one()
+            self.zf.close()
+        except: return None
+        finally: self.pool.shutdown(wait=False)
+        if self.zf.filelist: return self.path
+        try: os.remove(self.path)
+        except OSError: pass
+        return None
+
+# ── Backup store ───────────────────────────────────────────────────────────────
+
+STORE_DIR = os.path.join(BASE_DIR, "backups", "store")
+GC_GRACE  = 3600   # unreferenced blobs younger than this survive a GC (runs in progress)
+
+def _blob_path(h):
+    return os.path.join(STORE_DIR, "objects", h[:2], h)
+
+def _have_blob(h):
+    """True if blob h exists; refreshes its mtime so a concurrent GC keeps it."""
+    try: os.utime(_blob_path(h)); return True
+    except OSError: return False
+
+def _put_blob(data, name):
+    """Store content (worker side). Blobs are b'Z' + zlib data or b'S' + raw
+    data, by the same content-aware choice as zip backups.
+    Returns (sha256, bytes newly written)."""
+    h = hashlib.sha256(data).hexdigest()
+    if _have_blob(h): return h, 0
+    if _pick_method(name, data[:PROBE_SIZE]) == zipfile.ZIP_DEFLATED:
+        payload = b"Z" + zlib.compress(data)
+    else:
+        payload = b"S" + data
+    p = _blob_path(h); os.makedirs(os.path.dirname(p), exist_ok=True)
+    tmp = f"{p}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, 'wb') as f: f.write(payload)
+    os.replace(tmp, p)
+    return h, len(payload)
+
+def _put_blob_stream(fp, name):
+    """Store a large file in one streaming pass: hash, compress and write to a
+    temp blob together, then rename it to its hash (or drop it if known)."""
+    objs = os.path.join(STORE_DIR, "objects"); os.makedirs(objs, exist_ok=True)
+    tmp = os.path.join(objs, f"{uuid.uuid4().hex}.tmp")
+    h = hashlib.sha256(); n = 0
+    try:
+        with open(fp, 'rb') as src, open(tmp, 'wb') as dst:
+            chunk = src.read(1024**2)
+            z = _pick_method(name, chunk[:PROBE_SIZE]) == zipfile.ZIP_DEFLATED
+            c = zlib.compressobj() if z else None
+            dst.write(b"Z" if z else b"S"); n = 1
+            while chunk:
+                h.update(chunk)
+                out = c.compress(chunk) if z else chunk
+                dst.write(out); n += len(out)
+                chunk = src.read(1024**2)
+            if z:
+                out = c.flush(); dst.write(out); n += len(out)
+        d = h.hexdigest()
+        if _have_blob(d):
+            os.remove(tmp); return d, 0
+        p = _blob_path(d); os.makedirs(os.path.dirname(p), exist_ok=True)
+        os.replace(tmp, p)
+        return d, n
+    except:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+class StoreWriter:
+    """Backup run in the content-addressed store. Same interface as
+    BackupWriter: files already stored by an earlier run are only referenced
+    by the run manifest (backups/store/runs/<run>.json), not written again."""
+
+    def __init__(self, name, max_bytes, workers=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.added = 0
+        self.full = False
+        self.files = []
+        self.throttle = thr = current_throttle()
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers or BACKUP_WORKERS),
+                                       initializer=thr.init_worker if thr else None)
+        self.pending = deque(); self.inflight = 0
+        self.bytes_in = 0; self.bytes_out = 0; self.deduped = 0
+        self.t0 = time.time()
+
+    def add(self, fp, arcname, size):
+        if self.full: return
+        if self.added + size > self.max_bytes:
+            if self.added >= self.max_bytes: self.full = True
+            return
+        if self.throttle: self.throttle.tick(nbytes=size)
+        try:
+            st = os.stat(fp)
+            meta = {"arc": arcname.replace(os.sep, "/"), "path": fp, "size": st.st_size, "mtime": st.st_mtime}
+            if size > MEMBER_MAX:
+                self._done(meta, _put_blob_stream(fp, fp))
+            else:
+                with open(fp, 'rb') as f: data = f.read()
+                self.pending.append((meta, self.pool.submit(_put_blob, data, fp)))
+                self.inflight += len(data)
+                while self.inflight > BACKUP_WINDOW: self._write_one()
+            self.added += size
+        except (OSError, ValueError): pass
+
+    def _done(self, meta, res):
+        meta["hash"], new = res
+        self.files.append(meta)
+        self.bytes_in += meta["size"]; self.bytes_out += new
+        if not new: self.deduped += 1
+
+    def _write_one(self):
+        meta, fut = self.pending.popleft()
+        self.inflight -= meta["size"]
+        try: self._done(meta, fut.result())
+        except OSError: pass
+
+    def stats(self):
+        dt = max(time.time() - self.t0, 1e-6)
+        return {"files": len(self.files), "deduplicated": self.deduped,
+                "bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else 1.0,
+                "mb_per_sec": round(self.bytes_in / 1024**2 / dt, 1)}
+
+    def close(self):
+        """Write the run manifest; returns its name, or None if nothing was stored."""
+        try:
+            while self.pending: self._write_one()
+        finally: self.pool.shutdown(wait=False)
+        if not self.files: return None
+        runs = os.path.join(STORE_DIR, "runs"); os.makedirs(runs, exist_ok=True)
+        try:
+            write_json_atomic(os.path.join(runs, self.name + ".json"),
+                              {"name": self.name, "created": datetime.now().isoformat(),
+                               "size": self.bytes_in, "stored": self.bytes_out, "files": self.files})
+        except OSError: return None
+        return self.name
+
+RUN_RE = re.compile(r'^run_\d+_\d+(_\d+)?$')
+
+def load_run(name):
+    if not RUN_RE.match(name or ""): return None
+    try:
+        with open(os.path.join(STORE_DIR, "runs", name + ".json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except: return None
+
+def list_runs(strict=False):
+    """All run manifests, newest first. Unreadable ones are skipped, or with
+    strict raise ValueError (GC must not sweep blobs they may reference)."""
+    try: names = [f[:-5] for f in os.listdir(os.path.join(STORE_DIR, "runs"))
+                  if f.endswith(".json") and not f.startswith(".tmp_")]
+    except FileNotFoundError: return []
+    except OSError:
+        if strict: raise ValueError("A mentések listája nem olvasható")
+        return []
+    runs = []
+    for n in sorted(names, reverse=True):
+        r = load_run(n)
+        if not (isinstance(r, dict) and isinstance(r.get("files"), list)
+                and all(isinstance(f, dict) and "hash" in f for f in r["files"])):
+            if strict: raise ValueError(f"Hibás mentés-leíró: {n}.json")
+            continue
+        runs.append(r)
+    return runs
+
+def restore_run(name, target=None, overwrite=False):
+    """Stream every file of a run back out of the store: to its original
+    path, or under `target` by archive name. Existing files are kept unless
+    overwrite is set."""
+    run = load_run(name)
+    if run is None: raise ValueError("Ismeretlen mentés")
+    restored = skipped = errors = nbytes = 0; dirs = set()
+    for f in run["files"]:
+        dest = os.path.join(target, *f["arc"].split("/")) if target else f["path"]
+        job_tick(dest)
+        if os.path.exists(dest) and not overwrite:
+            skipped += 1; continue
+        try:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with open(_blob_path(f["hash"]), 'rb') as src, open(dest, 'wb') as dst:
+                z = src.read(1) == b"Z"
+                d = zlib.decompressobj() if z else None
+                while chunk := src.read(1024**2):
+                    dst.write(d.decompress(chunk) if z else chunk)
+                if z: dst.write(d.flush())
+            os.utime(dest, (f["mtime"], f["mtime"]))
+            restored += 1; nbytes += f["size"]; dirs.add(os.path.dirname(dest))
+        except OSError: errors += 1
+    if restored: tree_changed(dirs)
+    return {"restored": restored, "skipped": skipped, "errors": errors,
+            "bytes": nbytes, "bytes_fmt": fmt(nbytes)}
+
+def gc_store(doomed=None):
+    """Mark-and-sweep: remove blobs no run manifest references anymore.
+    Aborts (ValueError) without deleting anything if a manifest cannot be
+    read. `doomed` maps the hashes of a just deleted run to its manifest
+    mtime: those blobs skip GC_GRACE unless touched since that run."""
+    live = {f["hash"] for r in list_runs(strict=True) for f in r["files"]}
+    removed = freed = 0; now = time.time(); doomed = doomed or {}
+    def dead(e, st):
+        name = e.name[:-4] if e.name.endswith(".tmp") else e.name
+        if name in live: return None
+        if now - st.st_mtime < GC_GRACE and not st.st_mtime <= doomed.get(name, -1): return None
+        return e.path, st.st_size
+    for p, sz in walk_tree(os.path.join(STORE_DIR, "objects"), on_file=dead)[1]:
+        try: os.remove(p); removed += 1; freed += sz
+        except OSError: pass
+    return {"removed": removed, "freed": freed, "freed_fmt": fmt(freed)}
+
+def delete_run(name):
+    """Remove a run manifest, then collect the blobs only it referenced."""
+    run = load_run(name)
+    mf = os.path.join(STORE_DIR, "runs", name + ".json")
+    mtime = os.stat(mf).st_mtime
+    os.remove(mf)
+    doomed = {f["hash"]: mtime for f in run["files"]} if isinstance(run, dict) and isinstance(run.get("files"), list) else {}
+    return gc_store(doomed)
+
+def open_backup():
     profile = get_profile()
     if not profile.get("auto_backup", True):
         return None
-    max_bytes = profile.get("backup_max_mb", 200) * 1024 * 1024
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = os.path.join(BASE_DIR, "backups", f"backup_{ts}.zip")
-    total_added = 0
+    max_bytes = profile.get("backup_max_mb", 200) * 1024 * 1024
     try:
-        with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
-            for cat in categories:
-                for d in dirs_map.get(cat, []):
-                    if not os.path.exists(d): continue
-                    try:
-                        for root, _, files in os.walk(d):
-                            for f in files:
-                                if total_added >= max_bytes: break
-                                fp = os.path.join(root, f)
-                                try:
-                                    sz = os.path.getsize(fp)
-                                    if total_added + sz > max_bytes: continue
-                                    arc_name = os.path.relpath(fp, os.path.dirname(d))
-                                    zf.write(fp, os.path.join(cat, arc_name))
-                                    total_added += sz
-                                except: pass
-                    except: pass
-        return backup_path if os.path.getsize(backup_path) > 22 else None
-    except:
+        if profile.get("backup_format", "store") == "store":
+            name = f"run_{ts}"; n = 1
+            while os.path.exists(os.path.join(STORE_DIR, "runs", name + ".json")):
+                n += 1; name = f"run_{ts}_{n}"
+            return StoreWriter(name, max_bytes)
+        return BackupWriter(os.path.join(BASE_DIR, "backups", f"backup_{ts}.zip"), max_bytes)
+    except OSError:
         return None
 
 # ── Core clean logic ───────────────────────────────────────────────────────────
 
-def _do_clean(categories, min_age=0, auto=False):
-    total_freed=0; total_files=0; total_errors=0; details=[]
+CLEAN_LOCK = threading.Lock()   # one clean at a time: manual, scheduled or planned
 
-    dirs_map = {
-        "temp":       get_temp_dirs(),
-        "browser":    get_browser_dirs(),
-        "logs":       get_log_dirs(),
-        "thumbnails": get_thumb_dirs(),
-    }
-    # Custom dirs from profile
-    profile = get_profile()
-    for cd in profile.get("custom_dirs", []):
-        if os.path.exists(cd):
-            dirs_map.setdefault("custom", []).append(cd)
+def _do_clean(categories, min_age=0, auto=False, plan=None, schedule=None):
+    """Execute a clean plan (built here if not given) for `categories`.
+    Cleans are serialized on CLEAN_LOCK; a waiting job stays cancellable."""
+    job = current_job()
+    while not CLEAN_LOCK.acquire(timeout=0.5):
+        if job: job.progress("Várakozás egy futó tisztításra..."); job.check()
+    try:
+        with throttled(get_profile(), auto) as thr:
+            entry, backup_file = run_throttled(thr, _clean_locked, categories, min_age, auto, plan)
+    finally:
+        CLEAN_LOCK.release()
+    if schedule: entry["schedule"] = schedule
+    if thr: entry["throttle"] = thr.stats()
+    HISTORY.append(entry)
+    return entry, backup_file
 
-    # Backup first
-    backup_file = create_backup([c for c in categories if c not in ("trash",)], dirs_map)
+def _clean_locked(categories, min_age, auto, plan):
+    total_freed=0; total_files=0; total_errors=0; details=[]
+    if plan is None:
+        plan = build_plan(categories, min_age)
+    else:
+        plan.revalidate()
+        categories = [c for c in categories if c in plan.categories]
+
+    # Each file is archived into the backup right before it is deleted
+    backup = open_backup() if any(c != "trash" for c in categories) else None
 
+    job = current_job(); cancelled = False
     for cat in categories:
+        if cancelled: break
         freed=0; files=0; errs=0
-        if cat in dirs_map:
-            for d in dirs_map[cat]:
-                if not os.path.exists(d): continue
-                if cat == "logs":
-                    try:
-                        for root, _, lf in os.walk(d):
-                            for f in lf:
-                                if any(f.endswith(e) for e in (".log",".old",".bak",".tmp")):
-                                    fp = os.path.join(root, f)
-                                    try:
-                                        sz=os.path.getsize(fp); os.remove(fp)
-                                        files+=1; freed+=sz
-                                    except: errs+=1
-                    except: pass
-                else:
-                    f2,e2,b2 = clean_dir(d, True, min_age)
-                    files+=f2; errs+=e2; freed+=b2
-        elif cat == "trash":
-            try:
-                if SYSTEM == "Linux":
-                    for tp in ["~/.local/share/Trash/files","~/.local/share/Trash/info"]:
-                        tp2 = os.path.expanduser(tp)
-                        if os.path.exists(tp2):
-                            f2,e2,b2 = clean_dir(tp2, True)
-                            files+=f2; errs+=e2; freed+=b2
-                elif SYSTEM == "Darwin":
-                    tp2 = os.path.expanduser("~/.Trash")
-                    if os.path.exists(tp2):
-                        f2,e2,b2 = clean_dir(tp2, True)
-                        files+=f2; errs+=e2; freed+=b2
-                elif SYSTEM == "Windows":
+        keep = None
+        if backup and cat != "trash":
+            def keep(fp, sz, cat=cat):
+                backup.add(fp, os.path.join(cat, os.path.relpath(fp, plan.base_of(fp))), sz)
+        emptied = set()
+        try:
+            for pe in plan.by_cat(cat):
+                if pe.path is None:
                     subprocess.run(["PowerShell","-Command",
                         "Clear-RecycleBin -Force -ErrorAction SilentlyContinue"],
                         capture_output=True, timeout=15)
-                    files=1
-            except: pass
+                    files+=pe.files; freed+=pe.size
+                elif pe.is_dir:
+                    r, e2, b = delete_tree(pe.path, keep)
+                    files+=r; errs+=e2; freed+=b
+                else:
+                    job_tick(pe.path)
+                    try:
+                        if keep: keep(pe.path, pe.size)
+                        _unlink(pe.path); files+=1; freed+=pe.size
+                        if job: job.progress(nbytes=pe.size, files=1)
+                        if cat != "logs": emptied.add(os.path.dirname(pe.path))
+                    except FileNotFoundError: pass
+                    except OSError: errs+=1
+        except JobCancelled:
+            cancelled = True
+        except Exception:
+            errs+=1
+        # Rule-selected files were deleted one by one; drop the directories
+        # that became empty (never a category root, logs keep their layout)
+        roots = {d for c, d, _ in plan.roots if c == cat}
+        for p in sorted(emptied, key=len, reverse=True):
+            while p not in roots and any(p.startswith(r.rstrip(os.sep) + os.sep) for r in roots):
+                try: os.rmdir(p)
+                except OSError: break
+                p = os.path.dirname(p)
 
         total_freed+=freed; total_files+=files; total_errors+=errs
-        labels={"temp":"Ideiglenes fájlok","browser":"Böngésző cache","logs":"Log fájlok",
-                "thumbnails":"Bélyegkép cache","trash":"Lomtár","custom":"Egyéni mappák"}
-        details.append({"category": labels.get(cat, cat), "files": files,
+        details.append({"category": CLEAN_LABELS.get(cat, cat), "files": files,
                         "freed": fmt(freed), "freed_bytes": freed, "errors": errs})
 
+    backup_file = backup.close() if backup else None
+    backup_stats = backup.stats() if backup_file else None
+    if isinstance(backup, StoreWriter):
+        # blobs of deleted runs that were still in their grace period
+        try: gc_store()
+        except (ValueError, OSError): pass
+
+    tree_changed([d for c, d, _ in plan.roots if c in categories])
+    PLANS.drop(plan.id)
+
     entry = {
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "auto": auto, "categories": categories,
         "total_freed": fmt(total_freed), "total_freed_bytes": total_freed,
         "total_files": total_files, "total_errors": total_errors,
         "details": details,
-        "backup": os.path.basename(backup_file) if backup_file else None
+        "backup": os.path.basename(backup_file) if backup_file else None,
+        "backup_stats": backup_stats,
+        "cancelled": cancelled, "plan_id": plan.id
     }
-    save_history(entry)
     return entry, backup_file
 
 # ── Registry clean (Windows) ───────────────────────────────────────────────────
@@ -520,101 +2066,616 @@ def clean_registry_item(item_path, item_type):
 
 # ── Duplicate finder ──────────────────────────────────────────────────────────
 
-def find_duplicates(path, min_size_kb=10):
-    min_bytes = min_size_kb * 1024
+SAMPLE_BLOCK = 4096   # bytes read at head, middle and tail by the sample stage
+HASH_ALGOS   = ("md5", "sha1", "sha256", "blake2b")
+HASH_WORKERS = int(os.environ.get("PYCLEANER_HASH_WORKERS") or min(8, os.cpu_count() or 4))
+HASH_BATCH   = 256    # files handed to the hashing pool at once
+MMAP_MIN     = 64 * 1024**2
+
+def _hash_file(fp, algo="md5", sz=None):
+    """Full-content digest. Buffer size grows with the file; very large files
+    are hashed through mmap so no intermediate copies are made."""
+    h = hashlib.new(algo); n = 0
+    with open(fp, 'rb') as f:
+        if sz is None: sz = os.fstat(f.fileno()).st_size
+        if sz >= MMAP_MIN:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    mv = memoryview(m)
+                    for off in range(0, len(m), 8 * 1024**2):
+                        h.update(mv[off:off + 8 * 1024**2])
+                    n = len(m); mv.release()
+                return h.hexdigest(), n
+            except (ValueError, OSError):
+                f.seek(0)
+        buf = bytearray(1024**2 if sz >= 1024**2 else 65536); mv = memoryview(buf)
+        while k := f.readinto(buf):
+            h.update(mv[:k]); n += k
+    return h.hexdigest(), n
+
+def _sample_hash(fp, sz, algo="md5"):
+    """Hash head, middle and tail blocks. Files small enough to be covered
+    completely are hashed whole, so the digest equals the full-content one."""
+    if sz <= 3 * SAMPLE_BLOCK:
+        return _hash_file(fp, algo, sz)
+    h = hashlib.new(algo); n = 0
+    with open(fp, 'rb') as f:
+        for off in (0, (sz - SAMPLE_BLOCK) // 2, sz - SAMPLE_BLOCK):
+            f.seek(off); b = f.read(SAMPLE_BLOCK)
+            h.update(b); n += len(b)
+    return h.hexdigest(), n
+
+# A duplicate candidate and the identity the hash cache is keyed on
+FileRef = namedtuple("FileRef", "path dev ino mtime_ns")
+
+def _file_ref(e, st):
+    if not st.st_ino:   # DirEntry.stat() on Windows leaves st_ino/st_dev zero
+        st = os.stat(e.path, follow_symlinks=False)
+    return FileRef(e.path, st.st_dev, st.st_ino, st.st_mtime_ns)
+
+def _alloc_bytes(st):
+    """Bytes actually allocated on disk (st_blocks is in 512-byte units)."""
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+class HashCache:
+    """Persistent digests in DATA_DIR/hash_cache.db keyed on
+    (device, inode, size, mtime_ns, algorithm, kind); a file whose identity
+    and modification stamp are unchanged is never read again. Rows carry a
+    last-used time and the table is trimmed to `max_rows` (LRU)."""
+
+    def __init__(self, path, max_rows):
+        self.path = path
+        self.max_rows = max_rows
+        self.db = None
+        self.lock = threading.Lock()
+
+    def _conn(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,
+                algo TEXT, kind TEXT, digest TEXT, used REAL,
+                PRIMARY KEY (dev, ino, size, mtime_ns, algo, kind)) WITHOUT ROWID""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS hashes_used ON hashes(used)")
+        return self.db
+
+    def get_many(self, refs, size, algo, kind):
+        """{ref: digest} for the refs that are cached; touches their LRU time."""
+        out = {}
+        with self.lock:
+            db = self._conn()
+            for r in refs:
+                row = db.execute("SELECT digest FROM hashes WHERE dev=? AND ino=? AND size=? "
+                                 "AND mtime_ns=? AND algo=? AND kind=?",
+                                 (r.dev, r.ino, size, r.mtime_ns, algo, kind)).fetchone()
+                if row: out[r] = row[0]
+            if out:
+                now = time.time()
+                db.executemany("UPDATE hashes SET used=? WHERE dev=? AND ino=? AND size=? "
+                               "AND mtime_ns=? AND algo=? AND kind=?",
+                               [(now, r.dev, r.ino, size, r.mtime_ns, algo, kind) for r in out])
+                db.commit()
+        return out
+
+    def put_many(self, rows, algo, kind):
+        """rows: [(ref, size, digest)]"""
+        if not rows: return
+        now = time.time()
+        with self.lock:
+            db = self._conn()
+            db.executemany("INSERT OR REPLACE INTO hashes VALUES (?,?,?,?,?,?,?,?)",
+                           [(r.dev, r.ino, sz, r.mtime_ns, algo, kind, d, now) for r, sz, d in rows])
+            db.commit()
+
+    def trim(self):
+        with self.lock:
+            db = self._conn()
+            n = db.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+            if n > self.max_rows:
+                db.execute("DELETE FROM hashes WHERE used <= (SELECT used FROM hashes "
+                           "ORDER BY used DESC LIMIT 1 OFFSET ?)", (self.max_rows,))
+                db.commit()
+
+HASH_CACHE = HashCache(os.path.join(DATA_DIR, "hash_cache.db"),
+                       int(os.environ.get("PYCLEANER_HASH_CACHE_MAX") or 500_000))
+
+def _pool_hash(groups, fn, pool, job, cache, algo, kind, counters):
+    """Hash the files of upstream groups on the pool, HASH_BATCH files at a
+    time (hashlib releases the GIL, so reads and digests overlap). Digests
+    found in the cache are used without reading the file.
+    Yields (group, [(ref, (digest, nread) | None)]) in upstream order."""
+    thr = current_throttle()
+    def one(ref, sz):
+        if job and job.cancelled: return None
+        if thr: thr.tick(nbytes=sz if kind == "full" else min(sz, 3 * SAMPLE_BLOCK))
+        try: return fn(ref.path, sz)
+        except OSError: return None
+    def flush(batch):
+        hits = [cache.get_many(g[1], g[0], algo, kind) if cache else {} for g in batch]
+        futs = [[(r, pool.submit(one, r, g[0]) if r not in hit else None) for r in g[1]]
+                for g, hit in zip(batch, hits)]
+        new = []
+        for g, hit, fs in zip(batch, hits, futs):
+            res = []
+            for r, fut in fs:
+                if fut is None:
+                    res.append((r, (hit[r], 0))); counters["hits"] += 1
+                    if job: job.progress(r.path, 0, 1)
+                    continue
+                x = fut.result(); res.append((r, x)); counters["misses"] += 1
+                if x: new.append((r, g[0], x[0]))
+                if job: job.progress(r.path, x[1] if x else 0, 1)
+            yield g, res
+        if cache: cache.put_many(new, algo, kind)
+        if job: job.check()
+    batch = []; n = 0
+    for g in groups:
+        batch.append(g); n += len(g[1])
+        if n >= HASH_BATCH:
+            yield from flush(batch); batch = []; n = 0
+    if batch: yield from flush(batch)
+
+def _dup_size_stage(path, min_bytes, stats, links):
+    """Stage 1: bucket files by size; yields (size, refs) buckets of 2+.
+    Hardlinks are collapsed to one ref per inode first (their extra paths go
+    to `links`), so the same data is never hashed or counted twice."""
     size_map = defaultdict(list)
+    rules = compile_rules(get_profile(), "duplicates"); now = time.time()
+    _, found = walk_tree(path, prune=rules.prune,
+                         on_file=lambda e, st: (st.st_size, _file_ref(e, st))
+                         if st.st_size >= min_bytes and rules.match(e.name, e.path, st, now) else None)
+    seen = set()
+    for sz, ref in found:
+        k = (ref.dev, ref.ino)
+        if k in seen:
+            links[k].append(ref.path); stats["size"]["hardlinks"] += 1; continue
+        seen.add(k)
+        size_map[sz].append(ref)
+    for sz, refs in size_map.items():
+        if len(refs) < 2: continue
+        stats["size"]["groups"] += 1; stats["size"]["files"] += len(refs)
+        stats["size"]["bytes"] += sz * len(refs)
+        yield sz, refs
+
+def _dup_sample_stage(groups, stats, algo, pool, job, cache):
+    """Stage 2: split buckets by sample hash; yields (size, refs, digest|None).
+    The digest is already final for files the sample covered completely."""
+    st = stats["sample"]
+    for (sz, _), res in _pool_hash(groups, lambda fp, sz: _sample_hash(fp, sz, algo), pool, job,
+                                   cache, algo, "sample", stats["cache"]):
+        by = defaultdict(list)
+        for r, x in res:
+            if x is None: stats["errors"] += 1; continue
+            by[x[0]].append(r); st["bytes_read"] += x[1]
+        for d, rs in by.items():
+            if len(rs) < 2: continue
+            st["groups"] += 1; st["files"] += len(rs)
+            yield sz, rs, (d if sz <= 3 * SAMPLE_BLOCK else None)
+
+def _dup_full_stage(groups, stats, algo, pool, job, cache):
+    """Stage 3: full-content hash of the surviving candidates."""
+    st = stats["full"]
+    done = []
+    def pending():
+        for sz, refs, digest in groups:
+            if digest is not None: done.append((digest, sz, refs))
+            else: yield sz, refs
+    for (sz, _), res in _pool_hash(pending(), lambda fp, sz: _hash_file(fp, algo, sz), pool, job,
+                                   cache, algo, "full", stats["cache"]):
+        while done: yield done.pop()
+        by = defaultdict(list)
+        for r, x in res:
+            if x is None: stats["errors"] += 1; continue
+            by[x[0]].append(r); st["bytes_read"] += x[1]
+        for d, rs in by.items():
+            if len(rs) < 2: continue
+            st["groups"] += 1; st["files"] += len(rs)
+            yield d, sz, rs
+    while done: yield done.pop()
+
+def find_duplicates(path, min_size_kb=10, algo="md5", workers=None, use_cache=True):
+    """size -> head/middle/tail sample -> full hash. Each stage is a generator
+    fed by the previous one; hashing runs on a pool of `workers` threads and
+    consults HASH_CACHE unless use_cache is False.
+    Returns (groups, stats) where stats has per-stage counters and the bytes
+    the sample stage saved from being read."""
+    if algo not in HASH_ALGOS: raise ValueError(f"Ismeretlen hash algoritmus: {algo}")
+    min_bytes = min_size_kb * 1024
+    stats = {"algorithm": algo,
+             "size":   {"groups": 0, "files": 0, "bytes": 0, "hardlinks": 0},
+             "sample": {"groups": 0, "files": 0, "bytes_read": 0},
+             "full":   {"groups": 0, "files": 0, "bytes_read": 0},
+             "cache":  {"hits": 0, "misses": 0},
+             "errors": 0}
+    job = current_job(); t0 = time.time()
+    cache = HASH_CACHE if use_cache else None
+    links = defaultdict(list)
+    thr = current_throttle()
+    with ThreadPoolExecutor(max_workers=max(1, workers or HASH_WORKERS),
+                            initializer=thr.init_worker if thr else None) as pool:
+        pipeline = _dup_size_stage(path, min_bytes, stats, links)
+        pipeline = _dup_sample_stage(pipeline, stats, algo, pool, job, cache)
+        pipeline = _dup_full_stage(pipeline, stats, algo, pool, job, cache)
+        groups = []
+        for h, sz, refs in pipeline:
+            files = [{"path": r.path, "size": sz, "size_fmt": fmt(sz),
+                      "hardlinks": links.get((r.dev, r.ino), [])}
+                     for r in sorted(refs, key=lambda r: r.path)]
+            wasted = sz * (len(files) - 1)
+            groups.append({"hash": h, "files": files, "wasted": fmt(wasted), "wasted_bytes": wasted})
+    read = stats["sample"]["bytes_read"] + stats["full"]["bytes_read"]
+    stats["bytes_read"] = read
+    stats["mb_per_sec"] = round(read / 1024**2 / max(time.time() - t0, 1e-6), 1)
+    if cache:
+        try: cache.trim()
+        except sqlite3.Error: pass
+    stats["bytes_avoided"] = max(0, stats["size"]["bytes"] - read)
+    groups.sort(key=lambda x: x["wasted_bytes"], reverse=True)
+    return groups[:100], stats
+
+FICLONE = 0x40049409   # Linux ioctl: share extents of src with dst (btrfs, xfs, ...)
+
+def _reflink(src, dst):
+    if SYSTEM != "Linux":
+        raise OSError("Reflink csak Linuxon támogatott")
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+def reclaim_duplicates(keep, extras, mode="delete", verify=True):
+    """Reclaim the space of `extras`, which duplicate `keep`, in one call:
+    delete them, or replace them with hardlinks/reflinks to `keep`.
+    Space is counted from st_blocks, and only when the last link to an
+    extra's inode goes away, so the figure is what the disk actually gets back."""
+    if mode not in ("delete", "hardlink", "reflink"):
+        raise ValueError(f"Ismeretlen mód: {mode}")
+    kst = os.stat(keep)
+    reclaimed = 0; done = []; errors = []
+    for fp in extras:
+        try:
+            st = os.lstat(fp)
+            if not stat.S_ISREG(st.st_mode):
+                raise OSError("Nem szabályos fájl")
+            if (st.st_dev, st.st_ino) == (kst.st_dev, kst.st_ino):
+                done.append(fp); continue   # already a hardlink of keep
+            if st.st_size != kst.st_size or (verify and not _same_content(keep, fp)):
+                raise OSError("A tartalom eltér")
+            freed = _alloc_bytes(st) if st.st_nlink <= 1 else 0
+            if mode == "delete":
+                _unlink(fp)
+            else:
+                tmp = f"{fp}.pyc_{uuid.uuid4().hex[:8]}"
+                try:
+                    if mode == "hardlink": os.link(keep, tmp)
+                    else: _reflink(keep, tmp); shutil.copystat(fp, tmp)
+                    os.replace(tmp, fp)
+                except:
+                    try: os.remove(tmp)
+                    except OSError: pass
+                    raise
+            reclaimed += freed; done.append(fp)
+            job_tick(fp, files=1)
+        except OSError as e:
+            errors.append({"path": fp, "error": str(e)})
+    return {"ok": not errors, "mode": mode, "processed": done, "errors": errors,
+            "reclaimed_bytes": reclaimed, "reclaimed": fmt(reclaimed)}
+
+def _same_content(a, b, chunk=1024**2):
+    """Byte comparison in chunks, with progress and cancellation per chunk."""
+    with open(a, 'rb') as fa, open(b, 'rb') as fb:
+        while True:
+            x = fa.read(chunk); y = fb.read(chunk)
+            if x != y: return False
+            if not x: return True
+            job_tick(b, nbytes=len(x))
+
+# ── Monitoring (SSE) ──────────────────────────────────────────────────────────
+
+MONITOR_INTERVAL  = 1.0
+MONITOR_QUEUE     = 4     # frames buffered per client; older ones are dropped
+MONITOR_KEEPALIVE = 15
+MONITOR_RETENTION = int(os.environ.get("PYCLEANER_MONITOR_RETENTION") or 86400)   # seconds of history
+MONITOR_RECORD    = os.environ.get("PYCLEANER_MONITOR_RECORD", "1") != "0"           # sample without clients
+
+def read_metrics():
+    """Raw system counters: percentages, byte counts and cumulative I/O."""
+    m = {"t": round(time.time(), 3), "cpu": psutil.cpu_percent(interval=None)}
+    mem = psutil.virtual_memory(); swap = psutil.swap_memory()
+    m.update(ram_pct=mem.percent, ram_used=mem.used, ram_total=mem.total, ram_available=mem.available,
+             swap_pct=swap.percent, swap_used=swap.used, swap_total=swap.total)
+    try:
+        drive = os.path.splitdrive(tempfile.gettempdir())[0] or "/"
+        disk = psutil.disk_usage(drive if drive else "/")
+        m.update(disk_pct=disk.percent, disk_free=disk.free)
+    except:
+        m.update(disk_pct=0, disk_free=None)
+    try:
+        net = psutil.net_io_counters()
+        m.update(net_sent=net.bytes_sent, net_recv=net.bytes_recv)
+    except:
+        m.update(net_sent=None, net_recv=None)
     try:
-        for root, dirs, files in os.walk(path):
-            dirs[:] = [d for d in dirs if not d.startswith('.') and
-                      d not in ('node_modules','__pycache__','$Recycle.Bin',
-                                'System Volume Information','Windows')]
-            for f in files:
-                fp = os.path.join(root, f)
+        io = psutil.disk_io_counters()
+        m.update(disk_read=io.read_bytes, disk_write=io.write_bytes)
+    except:
+        m.update(disk_read=None, disk_write=None)
+    return m
+
+_PROC_STAT = SYSTEM == "Linux" and os.path.isdir("/proc")
+if _PROC_STAT:
+    CLK_TCK, PAGE_SIZE = os.sysconf("SC_CLK_TCK"), os.sysconf("SC_PAGE_SIZE")
+
+class ProcessTracker:
+    """Process table kept across ticks. Process handles are created once
+    per PID, so CPU% and I/O rates come from real deltas between ticks
+    instead of a first-call zero. Each update only diffs the PID set; on
+    Linux CPU time and RSS come from a single /proc/<pid>/stat read."""
+
+    KEYS = {"mem": lambda r: r["rss"], "cpu": lambda r: r["cpu_pct"],
+            "io": lambda r: r["io_read"] + r["io_write"]}
+
+    def __init__(self):
+        self.procs = {}    # pid -> [Process, name, start, t, cpu_time, io_read, io_write]
+        self.rows = []
+        self.lock = threading.Lock()
+
+    def _sample(self, p):
+        """(cpu seconds, rss, start marker) of one process."""
+        if _PROC_STAT:
+            with open(f"/proc/{p.pid}/stat", 'rb') as f:
+                r = f.read().rpartition(b")")[2].split()
+            return (int(r[11]) + int(r[12])) / CLK_TCK, int(r[21]) * PAGE_SIZE, int(r[19])
+        with p.oneshot():
+            ct = p.cpu_times()
+            return ct.user + ct.system, p.memory_info().rss, None
+
+    def update(self, io=False):
+        """Refresh all rows; I/O counters (an extra read per process) only if io."""
+        with self.lock:
+            now = time.monotonic()
+            total = psutil.virtual_memory().total or 1
+            pids = set(psutil.pids())
+            for pid in self.procs.keys() - pids: del self.procs[pid]
+            for pid in pids - self.procs.keys():
                 try:
-                    sz = os.path.getsize(fp)
-                    if sz >= min_bytes:
-                        size_map[sz].append(fp)
-                except: pass
-    except: pass
+                    p = psutil.Process(pid)
+                    self.procs[pid] = [p, p.name(), None, None, 0.0, 0, 0]
+                except psutil.Error: pass
+            rows = []
+            for pid, st in list(self.procs.items()):
+                p = st[0]
+                try:
+                    cpu, rss, start = self._sample(p)
+                    rd = wr = None
+                    if io:
+                        try: c = p.io_counters(); rd, wr = c.read_bytes, c.write_bytes
+                        except (psutil.AccessDenied, AttributeError): pass
+                except (psutil.NoSuchProcess, FileNotFoundError, ProcessLookupError):
+                    del self.procs[pid]; continue
+                except (psutil.Error, OSError, ValueError, IndexError): continue
+                if start != st[2] and st[2] is not None:
+                    del self.procs[pid]; continue     # PID reused; picked up next tick
+                dt = now - st[3] if st[3] is not None else 0
+                rows.append({
+                    "pid": pid, "name": st[1], "rss": rss,
+                    "mem_pct": round(rss * 100 / total, 1),
+                    "cpu_pct": round(max(0.0, cpu - st[4]) * 100 / dt, 1) if dt else 0.0,
+                    "io_read":  max(0, rd - st[5]) / dt if dt and rd is not None and st[5] is not None else 0.0,
+                    "io_write": max(0, wr - st[6]) / dt if dt and wr is not None and st[6] is not None else 0.0,
+                })
+                st[2:] = [start, now, cpu, rd, wr]
+            self.rows = rows
 
-    # Hash files that share size
-    hash_map = defaultdict(list)
-    for sz, paths in size_map.items():
-        if len(paths) < 2: continue
-        for fp in paths:
-            try:
-                h = hashlib.md5()
-                with open(fp, 'rb') as f:
-                    while chunk := f.read(65536):
-                        h.update(chunk)
-                hash_map[h.hexdigest()].append({"path": fp, "size": sz, "size_fmt": fmt(sz)})
-            except: pass
+    def top(self, n=8, key="mem"):
+        """Top n rows by key ("mem", "cpu" or "io") via a partial sort."""
+        with self.lock: rows = self.rows
+        return heapq.nlargest(n, rows, key=self.KEYS.get(key, self.KEYS["mem"]))
 
-    groups = [{"hash": h, "files": files, "wasted": fmt(files[0]["size"]*(len(files)-1)),
-               "wasted_bytes": files[0]["size"]*(len(files)-1)}
-              for h, files in hash_map.items() if len(files) >= 2]
-    groups.sort(key=lambda x: x["wasted_bytes"], reverse=True)
-    return groups[:100]
+PROCS = ProcessTracker()
 
-# ── Monitoring (SSE) ──────────────────────────────────────────────────────────
+def top_processes(n=8, key="mem", update=True):
+    try:
+        if update: PROCS.update(io=key == "io")
+        return [dict(r, io_read=round(r["io_read"]), io_write=round(r["io_write"]))
+                for r in PROCS.top(n, key)]
+    except:
+        return []
 
-def generate_monitor():
-    """Server-Sent Events generator for real-time CPU/RAM/disk."""
-    while True:
+RATE_FIELDS = ("net_sent", "net_recv", "disk_read", "disk_write")
+
+def add_rates(m, prev):
+    """Per-second <counter>_rate fields from the previous sample (0 on the first)."""
+    dt = m["t"] - prev["t"] if prev else 0
+    for f in RATE_FIELDS:
+        r = 0
+        if dt > 0 and m[f] is not None and prev[f] is not None:
+            r = round(max(0, m[f] - prev[f]) / dt)
+        m[f + "_rate"] = r
+    return m
+
+class MetricSeries:
+    """Fixed-size ring buffers (one float array per metric) of monitor
+    samples. Cumulative counters are stored as their per-second rates (see
+    add_rates). Memory is allocated once: capacity * (8 + 4 * len(fields))
+    bytes."""
+
+    GAUGES   = ("cpu", "ram_pct", "swap_pct", "disk_pct")
+    COUNTERS = RATE_FIELDS
+    FIELDS   = GAUGES + COUNTERS
+
+    def __init__(self, capacity):
+        self.cap = capacity
+        self.ts = array('d', bytes(8 * capacity))
+        self.cols = {f: array('f', bytes(4 * capacity)) for f in self.FIELDS}
+        self.n = 0
+        self.lock = threading.Lock()
+
+    def record(self, m):
+        with self.lock:
+            i = self.n % self.cap
+            self.ts[i] = m["t"]
+            for f in self.GAUGES: self.cols[f][i] = m[f]
+            for f in self.COUNTERS: self.cols[f][i] = m[f + "_rate"]
+            self.n += 1
+
+    def _ordered(self, arr, lo, hi):
+        """Slice [lo, hi) of the ring in chronological order."""
+        if self.n <= self.cap: return arr[lo:hi]
+        h = self.n % self.cap
+        return (arr[h:] + arr[:h])[lo:hi]
+
+    def query(self, start, end, step, fields=None):
+        """Downsample [start, end) into buckets of `step` seconds. Returns
+        bucket start times and per-field min/max/avg lists (None = no data)."""
+        fields = fields or self.FIELDS
+        with self.lock:
+            ts = self._ordered(self.ts, 0, min(self.n, self.cap))
+            lo, hi = bisect_left(ts, start), bisect_left(ts, end)
+            ts = ts[lo:hi]
+            cols = {f: self._ordered(self.cols[f], lo, hi) for f in fields}
+        nb = max(1, int(-(-(end - start) // step)))
+        out = {f: {"min": [], "max": [], "avg": []} for f in fields}
+        edges = [bisect_left(ts, start + k * step) for k in range(nb + 1)]
+        for k in range(nb):
+            a, b = edges[k], edges[k + 1]
+            for f in fields:
+                o = out[f]
+                if a == b:
+                    o["min"].append(None); o["max"].append(None); o["avg"].append(None)
+                    continue
+                v = cols[f][a:b]
+                o["min"].append(round(min(v), 2)); o["max"].append(round(max(v), 2))
+                o["avg"].append(round(sum(v) / (b - a), 2))
+        return {"start": start, "end": end, "step": step,
+                "t": [round(start + k * step, 3) for k in range(nb)], "series": out}
+
+MONITOR_SERIES = MetricSeries(int(MONITOR_RETENTION / MONITOR_INTERVAL))
+
+MONITOR_FIELDS   = ("cpu", "ram_pct", "ram_used", "ram_total", "ram_available",
+                    "swap_pct", "swap_used", "swap_total", "disk_pct", "disk_free",
+                    *RATE_FIELDS, *(f + "_rate" for f in RATE_FIELDS), "processes")
+MONITOR_KEYFRAME = 30    # every n-th frame of a client is sent in full
+
+class _Subscriber:
+    """Per-client sample queue; a slow client loses its oldest samples.
+    every: send each n-th sampler tick; fields: None = all; procs/sort: how
+    many top processes by which ProcessTracker key."""
+
+    def __init__(self, maxlen, every=1, fields=None, procs=8, sort="mem"):
+        self.frames = deque(maxlen=maxlen)
+        self.cond = threading.Condition()
+        self.every, self.fields, self.procs, self.sort = every, fields, procs, sort
+        if fields is not None and "processes" not in fields: self.procs = 0
+
+    def put(self, frame):
+        with self.cond:
+            self.frames.append(frame)
+            self.cond.notify()
+
+    def get(self, timeout):
+        with self.cond:
+            if not self.frames: self.cond.wait(timeout)
+            return self.frames.popleft() if self.frames else None
+
+    def select(self, snap):
+        """This client's view of a shared snapshot."""
+        if "error" in snap: return snap
+        d = {"ts": snap["t"]}
+        for f in self.fields or MONITOR_FIELDS:
+            if f != "processes": d[f] = snap[f]
+        if self.procs: d["processes"] = snap["processes"].get(self.sort, [])[:self.procs]
+        return d
+
+class MonitorHub:
+    """One sampler thread shared by all /api/monitor clients. It starts with
+    the first subscriber and exits once the last one has gone, unless `keep`
+    is set to record metrics into `series` (process sampling then still only
+    runs while somebody wants processes).
+
+    The sampler publishes one raw numeric snapshot per tick; each client's
+    stream picks its fields and sends delta frames with only changed values."""
+
+    def __init__(self, interval=MONITOR_INTERVAL, series=None, keep=False):
+        self.interval = interval
+        self.series = series
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.subs = set()
+        self.thread = None
+        self.last = None
+
+    def start(self):
+        with self.lock: self._start()
+
+    def _start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def subscribe(self, **opts):
+        sub = _Subscriber(MONITOR_QUEUE, **opts)
+        with self.lock:
+            self.subs.add(sub)
+            if self.last: sub.put(self.last)
+            self._start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock: self.subs.discard(sub)
+
+    def _run(self):
+        psutil.cpu_percent(interval=None)   # prime the CPU counter
+        next_t = time.time() + self.interval
+        prev = None
+        while True:
+            time.sleep(max(0, next_t - time.time()))
+            next_t = max(next_t + self.interval, time.time())
+            with self.lock:
+                want = {}
+                for s in self.subs:
+                    if s.procs: want[s.sort] = max(want.get(s.sort, 0), s.procs)
+                live = bool(self.subs)
+            try:
+                m = prev = add_rates(read_metrics(), prev)
+                if self.series is not None: self.series.record(m)
+                if want: PROCS.update(io="io" in want)
+                snap = dict(m, processes={k: top_processes(n, k, update=False) for k, n in want.items()})
+            except Exception as e: snap = {"error": str(e)}
+            with self.lock:
+                if not self.subs and not self.keep:
+                    self.thread = None; self.last = None
+                    return
+                self.last = snap if live else None
+                for s in self.subs: s.put(snap)
+
+    def stream(self, **opts):
+        if not HAS_PSUTIL:
+            yield f"data: {json.dumps({'error': 'psutil nem elérhető', 'ts': time.time()})}\n\n"
+            return
+        sub = self.subscribe(**opts)
+        prev = None; tick = sent = 0
         try:
-            if HAS_PSUTIL:
-                cpu = psutil.cpu_percent(interval=1)
-                mem = psutil.virtual_memory()
-                swap = psutil.swap_memory()
-                try:
-                    drive = os.path.splitdrive(tempfile.gettempdir())[0] or "/"
-                    disk = psutil.disk_usage(drive if drive else "/")
-                    disk_pct = disk.percent
-                    disk_free = fmt(disk.free)
-                except:
-                    disk_pct = 0; disk_free = "N/A"
-                # Network
-                try:
-                    net = psutil.net_io_counters()
-                    net_sent = fmt(net.bytes_sent)
-                    net_recv = fmt(net.bytes_recv)
-                except:
-                    net_sent = net_recv = "N/A"
-                # Top processes by memory
-                try:
-                    procs = []
-                    for p in psutil.process_iter(['pid','name','memory_percent','cpu_percent']):
-                        try:
-                            procs.append({
-                                "pid": p.info['pid'],
-                                "name": p.info['name'],
-                                "mem_pct": round(p.info['memory_percent'] or 0, 1),
-                                "cpu_pct": round(p.info['cpu_percent'] or 0, 1),
-                            })
-                        except: pass
-                    procs.sort(key=lambda x: x['mem_pct'], reverse=True)
-                    top_procs = procs[:8]
-                except:
-                    top_procs = []
-
-                data = {
-                    "cpu": cpu,
-                    "ram_pct": mem.percent, "ram_used": fmt(mem.used), "ram_total": fmt(mem.total),
-                    "ram_available": fmt(mem.available),
-                    "swap_pct": swap.percent, "swap_used": fmt(swap.used), "swap_total": fmt(swap.total),
-                    "disk_pct": disk_pct, "disk_free": disk_free,
-                    "net_sent": net_sent, "net_recv": net_recv,
-                    "processes": top_procs,
-                    "ts": datetime.now().strftime("%H:%M:%S")
-                }
-            else:
-                data = {"error": "psutil nem elérhető", "ts": datetime.now().strftime("%H:%M:%S")}
-            yield f"data: {json.dumps(data)}\n\n"
-        except GeneratorExit:
-            break
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-            time.sleep(2)
+            while True:
+                snap = sub.get(MONITOR_KEEPALIVE)
+                if snap is None:
+                    yield ": keepalive\n\n"; continue
+                tick += 1
+                if (tick - 1) % sub.every: continue
+                d = sub.select(snap)
+                if prev is None or "error" in d or sent % MONITOR_KEYFRAME == 0:
+                    out = dict(d, full=True)
+                else:
+                    out = {k: v for k, v in d.items() if prev.get(k) != v}
+                    out["ts"] = d.get("ts")
+                prev = d; sent += 1
+                yield f"data: {json.dumps(out, separators=(',', ':'))}\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+MONITOR = MonitorHub(series=MONITOR_SERIES, keep=MONITOR_RECORD)
+if HAS_PSUTIL and MONITOR_RECORD: MONITOR.start()
 
 # ── HTML Report ───────────────────────────────────────────────────────────────
 
@@ -690,65 +2751,33 @@ def index():
 
 # ── Scan ─────────────────────────────────────────────────────────────────────
 
+CLEAN_CATEGORIES = ('temp','browser','logs','thumbnails','custom','trash')
+
 @app.route('/api/scan', methods=['POST'])
 def scan():
-    cat = request.json.get('category', 'all')
-    res = {}
-
-    def scan_dirs(dirs, log_only=False):
-        t=0; fc=0
-        for d in dirs:
-            if log_only:
-                try:
-                    for root,_,files in os.walk(d):
-                        for f in files:
-                            if any(f.endswith(e) for e in (".log",".old",".bak",".tmp")):
-                                try: t+=os.path.getsize(os.path.join(root,f)); fc+=1
-                                except: pass
-                except: pass
-            else:
-                t+=dir_size(d); fc+=count_files(d)
-        return t, fc
-
-    if cat in ('temp','all'):
-        t,f = scan_dirs(get_temp_dirs())
-        res['temp'] = {'size':t,'size_fmt':fmt(t),'files':f}
-    if cat in ('browser','all'):
-        t,f = scan_dirs(get_browser_dirs())
-        res['browser'] = {'size':t,'size_fmt':fmt(t),'files':f}
-    if cat in ('logs','all'):
-        t,f = scan_dirs(get_log_dirs(), log_only=True)
-        res['logs'] = {'size':t,'size_fmt':fmt(t),'files':f}
-    if cat in ('thumbnails','all'):
-        t,f = scan_dirs(get_thumb_dirs())
-        res['thumbnails'] = {'size':t,'size_fmt':fmt(t),'files':f}
-
-    profile = get_profile()
-    custom_total = 0; custom_files = 0
-    for cd in profile.get('custom_dirs', []):
-        if os.path.exists(cd):
-            custom_total += dir_size(cd); custom_files += count_files(cd)
-    res['custom'] = {'size':custom_total,'size_fmt':fmt(custom_total),'files':custom_files}
-
-    # Trash
-    ts=0; tf=0
-    try:
-        if SYSTEM == "Windows":
-            for drv in [f"{chr(d)}:\\" for d in range(65,91) if os.path.exists(f"{chr(d)}:\\")]:
-                rb = os.path.join(drv,"$Recycle.Bin")
-                if os.path.exists(rb): ts+=dir_size(rb); tf+=count_files(rb)
-        elif SYSTEM == "Linux":
-            tp = os.path.expanduser("~/.local/share/Trash/files")
-            if os.path.exists(tp): ts=dir_size(tp); tf=count_files(tp)
-        elif SYSTEM == "Darwin":
-            tp = os.path.expanduser("~/.Trash")
-            if os.path.exists(tp): ts=dir_size(tp); tf=count_files(tp)
-    except: pass
-    res['trash'] = {'size':ts,'size_fmt':fmt(ts),'files':tf}
+    cat     = request.json.get('category', 'all')
+    min_age = request.json.get('min_age_days', 0)
+    key = ('scan', config_stamp(), cat, min_age)
+    if request.json.get('fresh'): RESULTS.invalidate()
+    res, meta = RESULTS.get(key, lambda: _scan(cat, min_age),
+                            valid=lambda r: PLANS.get(r['plan_id']) is not None)
+    return jsonify(dict(res, **meta))
+
+def _scan(cat, min_age):
+    res = {}; idx = {}
+
+    # Cleanable categories are previewed through a clean plan, so the numbers
+    # shown are exactly what /api/clean with this plan_id deletes
+    cats = list(CLEAN_CATEGORIES) if cat == 'all' else [c for c in CLEAN_CATEGORIES if c == cat]
+    plan = build_plan(cats, min_age, report=idx)
+    for c, t in plan.totals().items():
+        res[c] = {'size':t['size'],'size_fmt':t['size_fmt'],'files':t['files']}
+    res['plan_id'] = plan.id
 
     dl = os.path.expanduser("~/Downloads")
-    dls = dir_size(dl) if os.path.exists(dl) else 0
-    dlf = len([x for x in os.listdir(dl) if os.path.isfile(os.path.join(dl,x))]) if os.path.exists(dl) else 0
+    dls = 0; dlf = 0
+    if os.path.exists(dl):
+        st = tree_stats(dl, index=SCAN_INDEX, report=idx); dls = st.bytes; dlf = st.files
     res['downloads'] = {'size':dls,'size_fmt':fmt(dls),'files':dlf}
 
     try:
@@ -759,6 +2788,36 @@ def scan():
                        'used_pct':round(used/tot*100,1)}
     except: res['disk'] = {}
 
+    SCAN_INDEX.save()
+    res['index'] = idx
+    return res
+
+# ── Clean plans ───────────────────────────────────────────────────────────────
+
+@app.route('/api/plan', methods=['POST'])
+def create_plan():
+    categories = request.json.get('categories', list(CLEAN_CATEGORIES))
+    min_age    = request.json.get('min_age_days', 0)
+    return job_response(JOBS.submit("plan", lambda: build_plan(categories, min_age).summary()))
+
+@app.route('/api/plan/<pid>')
+def get_plan(pid):
+    plan = PLANS.get(pid)
+    if not plan: return jsonify({'error': 'A terv lejárt vagy nem létezik'}), 404
+    offset = request.args.get('offset', 0, type=int)
+    limit  = request.args.get('limit', 100, type=int)
+    res = plan.summary()
+    res['items'] = [{'category': e.cat, 'path': e.path, 'is_dir': e.is_dir, 'size': e.size,
+                     'size_fmt': fmt(e.size), 'files': e.files}
+                    for e in plan.entries[offset:offset + limit]]
+    return jsonify(res)
+
+@app.route('/api/plan/<pid>/revalidate', methods=['POST'])
+def revalidate_plan(pid):
+    plan = PLANS.get(pid)
+    if not plan: return jsonify({'error': 'A terv lejárt vagy nem létezik'}), 404
+    res = plan.revalidate()
+    res['summary'] = plan.summary()
     return jsonify(res)
 
 # ── Clean ─────────────────────────────────────────────────────────────────────
@@ -767,24 +2826,101 @@ def scan():
 def clean():
     categories = request.json.get('categories', [])
     min_age    = request.json.get('min_age_days', 0)
-    entry, backup = _do_clean(categories, min_age)
-    if backup:
-        entry['backup_url'] = f'/backups/{os.path.basename(backup)}'
-    return jsonify(entry)
+    plan = None
+    if request.json.get('plan_id'):
+        plan = PLANS.get(request.json['plan_id'])
+        if not plan: return jsonify({'error': 'A terv lejárt, futtass új beolvasást'}), 409
+        if not plan.matches(clean_dirs_map(get_profile())):
+            PLANS.drop(plan.id)
+            return jsonify({'error': 'A beállítások megváltoztak, futtass új beolvasást'}), 409
+    def run():
+        entry, backup = _do_clean(categories, min_age, plan=plan)
+        if backup and backup.endswith('.zip'):
+            entry['backup_url'] = f'/backups/{os.path.basename(backup)}'
+        return entry
+    return job_response(JOBS.submit("clean", run))
+
+# ── Jobs ─────────────────────────────────────────────────────────────────────
+
+@app.route('/api/jobs')
+def list_jobs():
+    return jsonify([j.to_dict(result=False) for j in JOBS.list()])
+
+@app.route('/api/jobs/<jid>')
+def get_job(jid):
+    job = JOBS.get(jid)
+    if not job: return jsonify({'error': 'Ismeretlen feladat'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<jid>/cancel', methods=['POST'])
+def cancel_job(jid):
+    job = JOBS.get(jid)
+    if not job: return jsonify({'ok': False, 'error': 'Ismeretlen feladat'}), 404
+    job.cancel()
+    return jsonify({'ok': True})
+
+@app.route('/api/jobs/<jid>/events')
+def job_events(jid):
+    job = JOBS.get(jid)
+    if not job: return jsonify({'error': 'Ismeretlen feladat'}), 404
+    def gen():
+        while True:
+            done = job.finished is not None
+            yield f"data: {json.dumps(job.to_dict(result=done))}\n\n"
+            if done: break
+            time.sleep(0.5)
+    return Response(gen(), mimetype='text/event-stream',
+                    headers={'Cache-Control':'no-cache', 'X-Accel-Buffering':'no'})
 
 # ── Monitor SSE ────────────────────────────────────────────────────────────────
 
 @app.route('/api/monitor')
 def monitor():
-    return Response(generate_monitor(),
+    """SSE stream: ?interval=<s>&fields=cpu,ram_pct,...&procs=<n>&sort=mem|cpu|io"""
+    try:
+        interval = float(request.args.get('interval', MONITOR.interval))
+        if not math.isfinite(interval): raise ValueError
+        every = max(1, round(interval / MONITOR.interval))
+        procs = min(max(int(request.args.get('procs', 8)), 0), 100)
+    except ValueError:
+        return jsonify({'error': 'Érvénytelen paraméter'}), 400
+    fields = [f for f in request.args.get('fields', '').split(',') if f] or None
+    bad = [f for f in fields or () if f not in MONITOR_FIELDS]
+    sort = request.args.get('sort', 'mem')
+    if bad or sort not in ProcessTracker.KEYS:
+        return jsonify({'error': f"Ismeretlen mező: {', '.join(bad or [sort])}",
+                        'fields': MONITOR_FIELDS, 'sort': list(ProcessTracker.KEYS)}), 400
+    return Response(MONITOR.stream(every=every, fields=fields, procs=procs, sort=sort),
                     mimetype='text/event-stream',
                     headers={'Cache-Control':'no-cache',
                              'X-Accel-Buffering':'no'})
 
+@app.route('/api/monitor/history')
+def monitor_history():
+    """Downsampled metric history: ?window=<s>&points=<n>&fields=cpu,ram_pct"""
+    try:
+        window = float(request.args.get('window', 3600))
+        if not math.isfinite(window): raise ValueError
+        window = min(max(window, 1), MONITOR_RETENTION)
+        points = min(max(int(request.args.get('points', 300)), 1), 2000)
+    except ValueError:
+        return jsonify({'error': 'Érvénytelen paraméter'}), 400
+    fields = [f for f in request.args.get('fields', '').split(',') if f] or None
+    bad = [f for f in fields or () if f not in MetricSeries.FIELDS]
+    if bad:
+        return jsonify({'error': f"Ismeretlen mező: {', '.join(bad)}", 'fields': MetricSeries.FIELDS}), 400
+    end = time.time()
+    step = max(window / points, MONITOR_INTERVAL)
+    return jsonify(MONITOR_SERIES.query(end - window, end, step, fields))
+
 # ── System info ───────────────────────────────────────────────────────────────
 
 @app.route('/api/system_info')
 def system_info():
+    info, meta = RESULTS.get(('system_info',), _system_info)
+    return jsonify(dict(info, **meta))
+
+def _system_info():
     info = {
         'os':        f"{platform.system()} {platform.release()}",
         'machine':   platform.machine(),
@@ -799,12 +2935,22 @@ def system_info():
         info.update({'disk_total':fmt(tot),'disk_used':fmt(used),
                      'disk_free':fmt(free),'disk_pct':round(used/tot*100,1)})
     except: pass
-    return jsonify(info)
+    return info
 
 # ── Disk usage ────────────────────────────────────────────────────────────────
 
 @app.route('/api/disk_usage')
 def disk_usage():
+    """{items, cached, age}; a fresh cached result is answered directly."""
+    if request.args.get('fresh'): RESULTS.invalidate()
+    hit = RESULTS.peek(('disk_usage',))
+    if hit: return jsonify({'items': hit[0], **hit[1]})
+    def run():
+        items, meta = RESULTS.get(('disk_usage',), _disk_usage)
+        return {'items': items, **meta}
+    return job_response(JOBS.submit("disk_usage", run))
+
+def _disk_usage():
     home = os.path.expanduser("~")
     dirs = [("Dokumentumok",os.path.join(home,"Documents")),
             ("Letöltések",  os.path.join(home,"Downloads")),
@@ -816,35 +2962,110 @@ def disk_usage():
     res = []
     for name, path in dirs:
         if os.path.exists(path):
-            sz = dir_size(path)
-            res.append({"name":name,"path":path,"size":sz,"size_fmt":fmt(sz)})
+            st = tree_stats(path, index=SCAN_INDEX)
+            res.append({"name":name,"path":path,"size":st.bytes,"size_fmt":fmt(st.bytes),
+                        "files":st.files,"dirs":st.dirs,"errors":st.errors})
     res.sort(key=lambda x:x['size'], reverse=True)
-    return jsonify(res)
+    SCAN_INDEX.save()
+    return res
+
+@app.route('/api/disk_tree')
+def disk_tree_route():
+    root  = request.args.get('root', os.path.expanduser('~'))
+    depth = max(0, min(request.args.get('depth', 2, type=int), 8))
+    top   = max(1, min(request.args.get('top', 10, type=int), 200))
+    if not os.path.isdir(root):
+        return jsonify({'error': 'Mappa nem található'}), 404
+    return job_response(JOBS.submit("disk_tree", disk_tree, root, depth, top))
 
 # ── Large files ───────────────────────────────────────────────────────────────
 
 @app.route('/api/large_files', methods=['POST'])
 def large_files():
-    path    = request.json.get('path', os.path.expanduser('~'))
-    min_mb  = request.json.get('min_size_mb', 50)
-    min_b   = min_mb * 1024 * 1024
-    skip    = {'.git','$Recycle.Bin','System Volume Information','Windows',
-               'Program Files','Program Files (x86)','node_modules','__pycache__'}
-    results = []
+    """Pages are slices of one ranked walk cached per search; a cached
+    search is answered directly, otherwise a job is started."""
+    j = request.json or {}
+    path = j.get('path', os.path.expanduser('~'))
     try:
-        for root, dirs, files in os.walk(path):
-            dirs[:] = [d for d in dirs if d not in skip and not d.startswith('.')]
-            for f in files:
-                fp = os.path.join(root, f)
-                try:
-                    sz = os.path.getsize(fp)
-                    if sz >= min_b:
-                        results.append({"name":f,"path":fp,"size":sz,
-                                        "size_fmt":fmt(sz),"ext":os.path.splitext(f)[1].lower()})
-                except: pass
-    except: pass
-    results.sort(key=lambda x:x['size'], reverse=True)
-    return jsonify(results[:40])
+        min_mb  = float(j.get('min_size_mb', 50))
+        offset  = min(max(0, int(j.get('offset', 0))), LARGE_MAX_K - 1)
+        limit   = max(1, min(int(j.get('limit', 40)), LARGE_MAX_K - offset))
+        min_age = float(j.get('min_age_days') or 0)
+        max_age = float(j['max_age_days']) if j.get('max_age_days') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Érvénytelen paraméter'}), 400
+    exts = j.get('exts') or []
+    if isinstance(exts, str): exts = re.split(r'[\s,;]+', exts)
+    if not isinstance(exts, list): return jsonify({'error': 'Érvénytelen kiterjesztéslista'}), 400
+    exts = tuple(sorted({e.lower() if e.startswith('.') else '.' + e.lower()
+                         for e in map(str, exts) if e.strip('.')})) or None
+    key = ('large_files', config_stamp(), path, min_mb, exts, min_age, max_age)
+    hit = RESULTS.peek(key)
+    if hit: return jsonify(_large_page(hit[0], offset, limit))
+    def run():
+        return _large_page(RESULTS.get(key, lambda: _large_files(path, min_mb, exts, min_age, max_age))[0],
+                           offset, limit)
+    return job_response(JOBS.submit("large_files", run))
+
+LARGE_MAX_K = 10000   # files ranked per search; offset + limit stays within it
+
+class TopK:
+    """Thread-safe bounded min-heap of the k largest (size, path, mtime),
+    plus per-extension totals over everything offered."""
+
+    def __init__(self, k):
+        self.k = k
+        self.heap = []
+        self.count = 0; self.total = 0
+        self.by_ext = defaultdict(lambda: [0, 0])
+        self.lock = threading.Lock()
+
+    def offer(self, size, path, mtime, ext):
+        item = (size, path, mtime)
+        with self.lock:
+            self.count += 1; self.total += size
+            e = self.by_ext[ext]; e[0] += 1; e[1] += size
+            if len(self.heap) < self.k: heapq.heappush(self.heap, item)
+            elif item > self.heap[0]: heapq.heapreplace(self.heap, item)
+
+    def ranked(self):
+        return sorted(self.heap, reverse=True)
+
+def _large_files(path, min_mb, exts=None, min_age=0, max_age=None):
+    """Stream the walk into a TopK of LARGE_MAX_K entries, so memory does not
+    grow with the number of qualifying files; returns the ranked list with
+    the totals, from which _large_page cuts pages."""
+    min_b = min_mb * 1024 * 1024
+    exts  = set(exts) if exts else None
+    now   = time.time()
+    newest = now - min_age * 86400 if min_age else None
+    oldest = now - max_age * 86400 if max_age else None
+    top = TopK(LARGE_MAX_K)
+    rules = compile_rules(get_profile(), "large_files")
+    def big(e, st):
+        if st.st_size < min_b: return None
+        if not rules.match(e.name, e.path, st, now): return None
+        if newest is not None and st.st_mtime > newest: return None
+        if oldest is not None and st.st_mtime < oldest: return None
+        ext = os.path.splitext(e.name)[1].lower()
+        if exts is not None and ext not in exts: return None
+        top.offer(st.st_size, e.path, st.st_mtime, ext)
+    walk_tree(path, on_file=big, prune=rules.prune)
+    by_ext = [{"ext":e or "?","count":c,"size":b,"size_fmt":fmt(b)}
+              for e, (c, b) in sorted(top.by_ext.items(), key=lambda x: -x[1][1])]
+    return {"ranked": top.ranked(), "total": top.count, "total_size": top.total,
+            "total_size_fmt": fmt(top.total), "by_ext": by_ext}
+
+def _large_page(res, offset, limit):
+    files = []
+    for sz, fp, mt in res["ranked"][offset:offset + limit]:
+        name = os.path.basename(fp)
+        files.append({"name":name,"path":fp,"size":sz,"size_fmt":fmt(sz),
+                      "ext":os.path.splitext(name)[1].lower(),
+                      "modified":datetime.fromtimestamp(mt).strftime('%Y-%m-%d %H:%M')})
+    return {"files": files, "total": res["total"], "ranked": len(res["ranked"]),
+            "total_size": res["total_size"], "total_size_fmt": res["total_size_fmt"],
+            "offset": offset, "limit": limit, "by_ext": res["by_ext"]}
 
 # ── Duplicates ────────────────────────────────────────────────────────────────
 
@@ -852,18 +3073,45 @@ def large_files():
 def duplicates():
     path     = request.json.get('path', os.path.expanduser('~'))
     min_size = request.json.get('min_size_kb', 10)
-    groups   = find_duplicates(path, min_size)
+    algo     = request.json.get('algorithm', 'md5')
+    workers  = request.json.get('workers')
+    if algo not in HASH_ALGOS:
+        return jsonify({'error': f'Ismeretlen hash algoritmus: {algo}', 'algorithms': HASH_ALGOS}), 400
+    return job_response(JOBS.submit("duplicates", _duplicates, path, min_size, algo, workers))
+
+def _duplicates(path, min_size, algo, workers):
+    with throttled(get_profile()) as thr:
+        groups, stats = run_throttled(thr, find_duplicates, path, min_size, algo, workers)
+    if thr: stats['throttle'] = thr.stats()
     total_waste = sum(g['wasted_bytes'] for g in groups)
-    return jsonify({'groups': groups, 'total_groups': len(groups),
-                    'total_wasted': fmt(total_waste), 'total_wasted_bytes': total_waste})
+    return {'groups': groups, 'total_groups': len(groups),
+            'total_wasted': fmt(total_waste), 'total_wasted_bytes': total_waste,
+            'stages': stats, 'bytes_avoided_fmt': fmt(stats['bytes_avoided']),
+            'cache_hits': stats['cache']['hits'], 'cache_misses': stats['cache']['misses']}
+
+@app.route('/api/duplicates/reclaim', methods=['POST'])
+def duplicates_reclaim():
+    keep   = request.json.get('keep', '')
+    extras = [p for p in request.json.get('files', []) if p != keep]
+    mode   = request.json.get('mode', 'delete')
+    verify = request.json.get('verify', True)
+    if mode not in ("delete", "hardlink", "reflink"):
+        return jsonify({'ok': False, 'error': f'Ismeretlen mód: {mode}'}), 400
+    if not os.path.isfile(keep):
+        return jsonify({'ok': False, 'error': 'A megtartandó fájl nem található'}), 400
+    return job_response(JOBS.submit("reclaim", _reclaim, keep, extras, mode, verify))
+
+def _reclaim(keep, extras, mode, verify):
+    try: return reclaim_duplicates(keep, extras, mode, verify)
+    finally: tree_changed((os.path.dirname(p) for p in extras), index=False)
 
 @app.route('/api/delete_file', methods=['POST'])
 def delete_file():
     path = request.json.get('path', '')
     try:
         if os.path.isfile(path):
-            os.chmod(path, stat.S_IWRITE)
-            os.remove(path)
+            _unlink(path)
+            tree_changed([os.path.dirname(path)], index=False)
             return jsonify({'ok': True})
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)})
@@ -884,16 +3132,62 @@ def registry_clean():
 
 # ── Scheduler ─────────────────────────────────────────────────────────────────
 
+def _schedule_view(name, s, now=None):
+    s = SCHEDULER.effective(name, s)
+    try: t = next_run(name, s, now)
+    except (TypeError, ValueError, OverflowError): t = None
+    return dict(s, name=name, next_run=t.isoformat(timespec="seconds") if t else None)
+
 @app.route('/api/schedule', methods=['GET'])
 def get_schedule():
-    return jsonify(load_schedule())
+    """The "default" schedule flat (legacy shape) plus all named schedules."""
+    now = datetime.now()
+    scheds = {n: _schedule_view(n, s, now) for n, s in load_schedules().items()}
+    return jsonify({**scheds.get("default", _schedule_view("default", SCHED_DEFAULT)), "schedules": scheds})
+
+def _check_schedule(s):
+    """Validate a schedule and store its numeric fields as numbers."""
+    if not isinstance(s, dict): return "Érvénytelen ütemezés"
+    try:
+        for k in ("interval_hours", "jitter_minutes", "min_age_days"):
+            v = float(s.get(k, SCHED_DEFAULT.get(k, 0)))
+            if v != v or v in (float("inf"), float("-inf")): raise ValueError
+            s[k] = int(v) if v.is_integer() else v
+    except (TypeError, ValueError): return "Érvénytelen szám"
+    if s["interval_hours"] <= 0: return "Az intervallum legyen pozitív"
+    if s["jitter_minutes"] < 0 or s["min_age_days"] < 0: return "Negatív érték"
+    if not isinstance(s.get("categories", []), list): return "Érvénytelen kategórialista"
+    bad = [c for c in s.get("categories", []) if c not in CLEAN_CATEGORIES]
+    return f"Ismeretlen kategória: {', '.join(bad)}" if bad else None
 
 @app.route('/api/schedule', methods=['POST'])
 def set_schedule():
-    s = request.json
-    save_schedule(s)
-    if s.get('enabled'):
-        start_scheduler()
+    """Body: {"schedules": {name: {...}}} replaces all; {"name": n, ...}
+    updates one; a body without a name updates "default" (legacy)."""
+    data = request.json or {}
+    with SCHEDULE.lock:
+        scheds = load_schedules()
+        if "schedules" in data:
+            new = {str(n): {**SCHED_DEFAULT, **scheds.get(n, {}), **v} for n, v in data["schedules"].items()}
+        else:
+            name = str(data.pop("name", "default"))
+            new = dict(scheds); new[name] = {**SCHED_DEFAULT, **scheds.get(name, {}), **data}
+        for s in new.values():
+            s.pop("name", None); s.pop("next_run", None)
+            err = _check_schedule(s)
+            if err: return jsonify({'ok': False, 'error': err}), 400
+        save_schedules(new)
+    start_scheduler()
+    return jsonify({'ok': True})
+
+@app.route('/api/schedule/<name>', methods=['DELETE'])
+def delete_schedule(name):
+    with SCHEDULE.lock:
+        scheds = load_schedules()
+        if scheds.pop(name, None) is None:
+            return jsonify({'ok': False, 'error': 'Ismeretlen ütemezés'}), 404
+        SCHEDULER.fired.pop(name, None)
+        save_schedules(scheds)
     return jsonify({'ok': True})
 
 # ── Config / Profiles ─────────────────────────────────────────────────────────
@@ -911,7 +3205,16 @@ def get_config():
 @app.route('/api/config', methods=['POST'])
 def set_config():
     data = request.json
-    cfg = load_config()
+    for rules in [data.get('profile_update', {}).get('rules'), data.get('new_profile', {}).get('rules')]:
+        err = rules is not None and check_rules(rules)
+        if err: return jsonify({'ok': False, 'error': err}), 400
+    with CONFIG.lock:
+        _update_config(load_config(), data)
+    # dirs, rules and profile may have changed: no result or plan outlives that
+    RESULTS.invalidate(); PLANS.clear()
+    return jsonify({'ok': True})
+
+def _update_config(cfg, data):
     # Theme
     if 'theme' in data: cfg['theme'] = data['theme']
     # Active profile
@@ -939,41 +3242,53 @@ def set_config():
             del cfg['profiles'][pid]
             cfg['active_profile'] = 'default'
     save_config(cfg)
-    return jsonify({'ok': True})
 
 @app.route('/api/config/verify_password', methods=['POST'])
 def verify_password():
-    pid = request.json.get('profile_id', load_config().get('active_profile','default'))
+    cfg = CONFIG.load(shared=True)
+    pid = request.json.get('profile_id', cfg.get('active_profile','default'))
     pwd = request.json.get('password', '')
-    cfg = load_config()
     stored = cfg.get('profiles', {}).get(pid, {}).get('password', '')
     return jsonify({'ok': (stored == '' or stored == pwd)})
 
 # ── History ───────────────────────────────────────────────────────────────────
 
+def history_filters(args):
+    """since/until/category/auto query parameters -> HistoryStore filters."""
+    auto = args.get('auto')
+    return {'since': args.get('from') or None, 'until': args.get('to') or None,
+            'category': args.get('category') or None,
+            'auto': None if auto in (None, '') else auto in ('1', 'true')}
+
 @app.route('/api/history')
 def get_history():
-    return jsonify(load_history())
+    """?limit=&offset=&from=YYYY-MM-DD&to=YYYY-MM-DD&category=&auto=0|1"""
+    try:
+        limit  = min(max(int(request.args.get('limit', 50)), 1), 1000)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'Érvénytelen paraméter'}), 400
+    f = history_filters(request.args)
+    return jsonify({'items': HISTORY.query(limit, offset, **f), 'summary': HISTORY.summary(**f),
+                    'offset': offset, 'limit': limit})
 
 @app.route('/api/history/clear', methods=['POST'])
 def clear_history():
-    try:
-        if os.path.exists(HISTORY_FILE): os.remove(HISTORY_FILE)
-    except: pass
+    HISTORY.clear()
     return jsonify({'ok': True})
 
 # ── Export report ─────────────────────────────────────────────────────────────
 
 @app.route('/api/export/html')
 def export_html():
-    html = build_html_report(load_history())
+    html = build_html_report(HISTORY.query(**history_filters(request.args)))
     return Response(html, mimetype='text/html',
                     headers={'Content-Disposition':
                              f'attachment; filename=pycleaner_report_{datetime.now().strftime("%Y%m%d")}.html'})
 
 @app.route('/api/export/json')
 def export_json():
-    data = json.dumps({'history': load_history(),
+    data = json.dumps({'history': HISTORY.query(**history_filters(request.args)),
                        'exported': datetime.now().isoformat(),
                        'system': platform.system()}, ensure_ascii=False, indent=2)
     return Response(data, mimetype='application/json',
@@ -991,9 +3306,14 @@ def list_backups():
             if f.endswith('.zip'):
                 fp = os.path.join(backup_dir, f)
                 bk.append({'name':f,'size':fmt(os.path.getsize(fp)),
-                           'url':f'/backups/{f}',
+                           'url':f'/backups/{f}', 'kind':'zip',
                            'date':datetime.fromtimestamp(os.path.getmtime(fp)).strftime('%Y-%m-%d %H:%M')})
     except: pass
+    for r in list_runs():
+        bk.append({'name':r['name'],'size':fmt(r.get('size',0)),'stored':fmt(r.get('stored',0)),
+                   'files':len(r['files']),'url':None,'kind':'store',
+                   'date':datetime.fromisoformat(r['created']).strftime('%Y-%m-%d %H:%M')})
+    bk.sort(key=lambda b: b['date'], reverse=True)
     return jsonify(bk)
 
 @app.route('/api/backups/delete', methods=['POST'])
@@ -1004,8 +3324,21 @@ def delete_backup():
             os.remove(os.path.join(BASE_DIR,'backups',name))
             return jsonify({'ok':True})
         except: pass
+    elif RUN_RE.match(name or ''):
+        try: return jsonify({'ok':True, 'gc':delete_run(name)})
+        except ValueError as e: return jsonify({'ok':True, 'gc':None, 'error':str(e)})
+        except OSError: pass
     return jsonify({'ok':False})
 
+@app.route('/api/backups/restore', methods=['POST'])
+def restore_backup():
+    name      = request.json.get('name','')
+    target    = request.json.get('target') or None
+    overwrite = bool(request.json.get('overwrite', False))
+    if load_run(name) is None:
+        return jsonify({'ok':False, 'error':'Ismeretlen mentés'}), 404
+    return job_response(JOBS.submit("restore", restore_run, name, target, overwrite))
+
 # ── Windows Tweaks ────────────────────────────────────────────────────────────
 
 @app.route('/api/tweaks/onedrive', methods=['POST'])
@@ -1063,5 +3396,7 @@ def app_exit():
     threading.Thread(target=shutdown).start()
     return jsonify({'ok': True, 'msg': 'Program leállítása...'})
 
+start_scheduler()
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
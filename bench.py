@@ -0,0 +1,138 @@
+"""
+PyCleaner — teljesítménymérések
+Futtatás: python bench.py walk [--dirs N] [--files N] [--workers N]
+          python bench.py hash [--files N] [--size-mb N] [--workers N]
+          python bench.py procs [--procs N] [--ticks N]
+"""
+
+import os, sys, time, shutil, tempfile, argparse, hashlib, subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+
+def make_tree(root, dirs, files, fanout=8, size=512):
+    """Synthetic tree: `dirs` directories (fanout-ary), `files` files each."""
+    paths = [root]
+    for i in range(dirs):
+        p = os.path.join(paths[i // fanout], f"d{i}")
+        os.makedirs(p, exist_ok=True); paths.append(p)
+        for k in range(files):
+            with open(os.path.join(p, f"f{k}.bin"), 'wb') as f:
+                f.write(b"x" * size)
+    return root
+
+def serial_walk_size(path):
+    """The pre-scandir dir_size + count_files, kept for comparison."""
+    total = 0; n = 0
+    for dp, _, fn in os.walk(path):
+        for f in fn:
+            try: total += os.path.getsize(os.path.join(dp, f))
+            except: pass
+    for _, _, fn in os.walk(path): n += len(fn)
+    return total, n
+
+def timed(fn, repeat=3):
+    best = None; res = None
+    for _ in range(repeat):
+        t = time.perf_counter(); res = fn(); dt = time.perf_counter() - t
+        best = dt if best is None else min(best, dt)
+    return best, res
+
+def bench_walk(a):
+    root = tempfile.mkdtemp(prefix="pyc_bench_")
+    try:
+        make_tree(root, a.dirs, a.files)
+        print(f"Fa: {a.dirs} mappa x {a.files} fájl ({root})")
+        dt, ref = timed(lambda: serial_walk_size(root))
+        print(f"  os.walk (régi, 2 bejárás) : {dt*1000:8.1f} ms  {ref}")
+        for w in sorted({1, 2, 4, a.workers}):
+            dt, st = timed(lambda: app.tree_stats(root, workers=w))
+            assert (st.bytes, st.files) == ref, st
+            print(f"  walk_tree workers={w:<3}      : {dt*1000:8.1f} ms  {st}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def bench_hash(a):
+    root = tempfile.mkdtemp(prefix="pyc_bench_")
+    try:
+        paths = []
+        for i in range(a.files):
+            p = os.path.join(root, f"h{i}.bin")
+            with open(p, 'wb') as f:
+                for _ in range(a.size_mb): f.write(os.urandom(1024**2))
+            paths.append(p)
+        total = a.files * a.size_mb
+        print(f"{a.files} fájl x {a.size_mb} MB = {total} MB (page cache-ből)")
+        def old_md5(p):
+            h = hashlib.md5()
+            with open(p, 'rb') as f:
+                while chunk := f.read(65536): h.update(chunk)
+            return h.hexdigest()
+        dt, _ = timed(lambda: [old_md5(p) for p in paths])
+        print(f"  régi md5, 64K, 1 szál        : {total/dt:8.1f} MB/s")
+        for algo in app.HASH_ALGOS:
+            for w in sorted({1, a.workers}):
+                def run():
+                    with ThreadPoolExecutor(max_workers=w) as pool:
+                        return list(pool.map(lambda p: app._hash_file(p, algo), paths))
+                dt, _ = timed(run)
+                print(f"  {algo:<8} workers={w:<3}          : {total/dt:8.1f} MB/s")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def old_top_processes(n=8):
+    """The per-tick process_iter sampling, kept for comparison."""
+    procs = []
+    for p in app.psutil.process_iter(['pid','name','memory_percent','cpu_percent']):
+        try:
+            procs.append({"pid": p.info['pid'], "name": p.info['name'],
+                          "mem_pct": round(p.info['memory_percent'] or 0, 1),
+                          "cpu_pct": round(p.info['cpu_percent'] or 0, 1)})
+        except: pass
+    procs.sort(key=lambda x: x['mem_pct'], reverse=True)
+    return procs[:n]
+
+def bench_procs(a):
+    if not app.HAS_PSUTIL: sys.exit("psutil szükséges")
+    kids = []
+    try:
+        for _ in range(max(0, a.procs - len(app.psutil.pids()))):
+            kids.append(subprocess.Popen(["sleep", "600"]))
+        print(f"{len(app.psutil.pids())} folyamat, {a.ticks} mintavétel")
+        def per_tick(fn):
+            t = time.perf_counter()
+            for _ in range(a.ticks): fn()
+            return (time.perf_counter() - t) / a.ticks
+        print(f"  process_iter (régi)      : {per_tick(old_top_processes)*1000:8.1f} ms/tick")
+        tr = app.ProcessTracker()
+        t = time.perf_counter(); tr.update(); first = time.perf_counter() - t
+        print(f"  ProcessTracker 1. tick   : {first*1000:8.1f} ms")
+        for key in ("mem", "cpu", "io"):
+            dt = per_tick(lambda: (tr.update(io=key == "io"), tr.top(8, key)))
+            print(f"  ProcessTracker top {key:<4} : {dt*1000:8.1f} ms/tick")
+    finally:
+        for k in kids: k.kill()
+        for k in kids: k.wait()
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("walk", help="párhuzamos vs soros bejárás")
+    w.add_argument("--dirs", type=int, default=2000)
+    w.add_argument("--files", type=int, default=20)
+    w.add_argument("--workers", type=int, default=app.WALK_WORKERS)
+    w.set_defaults(fn=bench_walk)
+    h = sub.add_parser("hash", help="hash áteresztőképesség MB/s-ben")
+    h.add_argument("--files", type=int, default=8)
+    h.add_argument("--size-mb", type=int, default=64)
+    h.add_argument("--workers", type=int, default=app.HASH_WORKERS)
+    h.set_defaults(fn=bench_hash)
+    p = sub.add_parser("procs", help="monitor folyamat-mintavétel költsége")
+    p.add_argument("--procs", type=int, default=5000)
+    p.add_argument("--ticks", type=int, default=5)
+    p.set_defaults(fn=bench_procs)
+    a = ap.parse_args()
+    a.fn(a)
+
+if __name__ == '__main__':
+    main()
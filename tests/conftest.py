@@ -0,0 +1,36 @@
+import os, sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as A
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """The app with config, schedules, history, index and store under tmp_path."""
+    data = tmp_path / "data"; data.mkdir()
+    monkeypatch.setattr(A.CONFIG, "path", str(data / "config.json"))
+    monkeypatch.setattr(A.CONFIG, "stamp", None); monkeypatch.setattr(A.CONFIG, "data", None)
+    monkeypatch.setattr(A.SCHEDULE, "path", str(data / "schedule.json"))
+    monkeypatch.setattr(A.SCHEDULE, "stamp", None); monkeypatch.setattr(A.SCHEDULE, "data", None)
+    monkeypatch.setattr(A, "HISTORY", A.HistoryStore(str(data / "history.db"), str(data / "history.json")))
+    monkeypatch.setattr(A, "SCAN_INDEX", A.ScanIndex(str(data / "scan_index.json")))
+    monkeypatch.setattr(A, "STORE_DIR", str(tmp_path / "store"))
+    A.RESULTS.invalidate(); A.PLANS.clear()
+    return A
+
+
+@pytest.fixture
+def client(env):
+    return env.app.test_client()
+
+
+def wait_job(client, r):
+    """Result of a 202 job response (or the direct JSON of any other)."""
+    import time
+    if r.status_code != 202: return r.get_json()
+    while True:
+        j = client.get(f"/api/jobs/{r.get_json()['job_id']}").get_json()
+        if j["status"] == "done": return j["result"]
+        if j["status"] in ("error", "cancelled"): raise AssertionError(j)
+        time.sleep(0.02)
@@ -0,0 +1,131 @@
+import os, time
+
+import pytest
+
+from conftest import wait_job
+
+
+def _scan(client, cat):
+    return wait_job(client, client.post("/api/scan", json={"category": cat}))
+
+
+def test_config_change_invalidates_scan_and_plan(client, tmp_path):
+    keep, junk = tmp_path / "keepme", tmp_path / "c2"
+    keep.mkdir(); junk.mkdir()
+    (keep / "precious").write_text("x"); (junk / "junk").write_text("y")
+    update = lambda d: client.post("/api/config", json={"profile_update": {"custom_dirs": [str(d)], "auto_backup": False}})
+
+    update(keep)
+    old = _scan(client, "custom")
+    update(junk)
+    new = _scan(client, "custom")
+    assert not new["cached"] and new["plan_id"] != old["plan_id"]
+
+    r = client.post("/api/clean", json={"categories": ["custom"], "plan_id": old["plan_id"]})
+    assert r.status_code == 409
+    assert (keep / "precious").exists()
+
+
+def test_plan_rejected_after_config_edited_on_disk(client, env, tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.mkdir(); b.mkdir(); (a / "f").write_text("x")
+    client.post("/api/config", json={"profile_update": {"custom_dirs": [str(a)], "auto_backup": False}})
+    plan = _scan(client, "custom")["plan_id"]
+
+    cfg = env.load_config(); cfg["profiles"]["default"]["custom_dirs"] = [str(b)]
+    time.sleep(0.01); env.save_config(cfg)
+    assert not _scan(client, "custom")["cached"]
+    assert client.post("/api/clean", json={"categories": ["custom"], "plan_id": plan}).status_code == 409
+    assert (a / "f").exists()
+
+
+def test_future_mtime_file_is_planned_and_deleted_without_min_age(client, env, tmp_path, monkeypatch):
+    plain, logs = tmp_path / "plain", tmp_path / "logs"
+    plain.mkdir(); logs.mkdir()
+    future = time.time() + 86400
+    for f in (plain / "skewed.tmp", logs / "skewed.log"):
+        f.write_text("x"); os.utime(f, (future, future))
+    monkeypatch.setattr(env, "clean_dirs_map", lambda profile: {"custom": [str(plain)], "logs": [str(logs)]})
+    client.post("/api/config", json={"profile_update": {"auto_backup": False}})
+
+    plan = env.build_plan(["custom", "logs"], 0)
+    assert {os.path.basename(e.path) for e in plan.entries} == {"skewed.tmp", "skewed.log"}
+    wait_job(client, client.post("/api/clean", json={"categories": ["custom", "logs"], "plan_id": plan.id}))
+    assert not (plain / "skewed.tmp").exists() and not (logs / "skewed.log").exists()
+
+
+def test_result_cache_is_bounded_and_sweeps_expired(env, monkeypatch):
+    rc = env.ResultCache(ttl=30, size=3)
+    now = [1000.0]
+    monkeypatch.setattr(env.time, "time", lambda: now[0])
+    for k in range(5): rc.get(k, lambda k=k: k)
+    assert list(rc.entries) == [2, 3, 4]
+    assert rc.get(2, lambda: "again") == (2, {"cached": True, "age": 0.0})   # hit refreshes 2
+    rc.get(5, lambda: 5)
+    assert list(rc.entries) == [4, 2, 5]
+
+    now[0] += 31
+    rc.get("late", lambda: 0)
+    assert list(rc.entries) == ["late"]
+
+
+def test_delete_file_drops_disk_tree_but_leaves_index(client, env, tmp_path, monkeypatch):
+    root = tmp_path / "r"; (root / "sub").mkdir(parents=True)
+    (root / "sub" / "f").write_bytes(b"x" * 5000); (root / "g").write_bytes(b"y" * 10)
+    assert env.tree_stats(str(root), index=env.SCAN_INDEX).bytes == 5010
+    env.disk_tree(str(root))
+    monkeypatch.setattr(env.ScanIndex, "save", lambda self: pytest.fail("index written"))
+
+    assert client.post("/api/delete_file", json={"path": str(root / "sub" / "f")}).get_json()["ok"]
+    assert not env.DISK_TREES.trees
+    assert str(root / "sub") in env.SCAN_INDEX.dirs
+    assert env.tree_stats(str(root), index=env.SCAN_INDEX).bytes == 10
+
+
+def test_scheduler_does_not_refire_when_schedule_cannot_be_saved(client, env, monkeypatch):
+    runs = []
+    monkeypatch.setattr(env, "_do_clean", lambda *a, **k: runs.append(k["schedule"]))
+    sched = env.Scheduler(); monkeypatch.setattr(env, "SCHEDULER", sched)
+    assert client.post("/api/schedule", json={"name": "n", "enabled": True, "categories": ["custom"]}).status_code == 200
+
+    def broken(obj): raise OSError("read-only")
+    monkeypatch.setattr(env.SCHEDULE, "save", broken)
+    sched.start()
+    time.sleep(0.5)
+    assert runs == ["n"]
+    assert env.SCHEDULE.load()["schedules"]["n"]["last_run"] is None
+    nxt = client.get("/api/schedule").get_json()["schedules"]["n"]["next_run"]
+    assert nxt > sched.fired["n"]
+
+
+@pytest.mark.parametrize("interval", ["inf", "-inf", "nan", "abc"])
+def test_monitor_rejects_non_finite_interval(client, interval):
+    assert client.get(f"/api/monitor?interval={interval}").status_code == 400
+
+
+@pytest.mark.parametrize("window", ["nan", "inf", "-inf", "x"])
+def test_monitor_history_rejects_non_finite_window(client, window):
+    assert client.get(f"/api/monitor/history?window={window}").status_code == 400
+
+
+def test_monitor_history_clamps_finite_window(client):
+    assert client.get("/api/monitor/history?window=1e12&points=10").status_code == 200
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_zip_backup_is_valid_on_both_write_paths(env, tmp_path, monkeypatch, fast):
+    import zipfile
+    if not fast: monkeypatch.setattr(env, "_zip_fast_ok", lambda zf: False)
+    src = tmp_path / "src"; src.mkdir()
+    files = {"text.txt": b"abc" * 50000, "random.bin": os.urandom(70000), "empty": b"",
+             "big.log": b"line\n" * (env.MEMBER_MAX // 5 + 10)}
+    for n, d in files.items(): (src / n).write_bytes(d)
+    w = env.BackupWriter(str(tmp_path / "b.zip"), 1 << 30, workers=2)
+    assert w.fast == (fast and env._zip_fast_ok(w.zf))
+    for n, d in files.items(): w.add(str(src / n), n, len(d))
+    path = w.close()
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        assert {n: zf.read(n) for n in zf.namelist()} == files
+        assert zf.getinfo("random.bin").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("text.txt").compress_type == zipfile.ZIP_DEFLATED